@@ -1,5 +1,6 @@
 from turtle import shape
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import hashlib
 import os
@@ -7,9 +8,12 @@ import re
 import sys
 import pandas as pd
 import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from operator import itemgetter
 #from config import AW_KEY, AW_KEY_SAND
-from gefreader import Gef2OpenClass, is_number
+from gefreader import UPLOAD_RULES, Gef2OpenClass
 
 
 # ToDo 05/09: 
@@ -21,6 +25,94 @@ from gefreader import Gef2OpenClass, is_number
 # - Start working on a map
 # if
 
+# Connections kept open per host by a FigshareClient
+POOL_SIZE = 10
+# Clients kept by get_client, the least recently used one is closed when another token comes in
+MAX_CLIENTS = 4
+
+
+class FigshareClient:
+    '''
+    HTTP client for the Figshare API with a pooled session
+
+    All requests go through one requests.Session, so the TCP and TLS connections are kept alive and reused
+    between calls instead of being set up for every request. The Authorization header of the token is
+    sent with every request by default, extra headers can be passed per request.
+
+    Parameters
+    ----------
+    api_token : str
+        Personal token to access API
+    pool_size : int
+        Number of connections kept open per host
+    '''
+
+    def __init__(self, api_token, pool_size=POOL_SIZE):
+        self.api_token = api_token
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({"Authorization": f"token {api_token}"})
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_clients = OrderedDict()
+
+
+def get_client(api_token):
+    '''
+    Returns the shared FigshareClient of a token, all API functions called with the same token reuse its connections
+
+    At most MAX_CLIENTS clients are kept, the least recently used one is closed when a new token needs a client
+    '''
+    client = _clients.get(api_token)
+    if client is None:
+        client = _clients[api_token] = FigshareClient(api_token)
+        while len(_clients) > MAX_CLIENTS:
+            _clients.popitem(last=False)[1].close()
+    else:
+        _clients.move_to_end(api_token)
+    return(client)
+
+
+def release_client(api_token):
+    '''
+    Closes the client get_client keeps for a token, e.g. when the session that used the token ends
+    '''
+    client = _clients.pop(api_token, None)
+    if client is not None:
+        client.close()
+
+
+def close_clients():
+    '''
+    Closes the clients kept by get_client and their connections
+    '''
+    while _clients:
+        _clients.popitem()[1].close()
+
+
 # Auxiliary functions
 def yes_no_input(user_input):
     '''
@@ -83,9 +175,8 @@ def get_licences(api_url, api_token ):
     api_token : str
         The personal token of the user    
     ''' 
-    response = requests.get(
+    response = get_client(api_token).get(
         url = api_url+"account/licenses", # private licences list
-        headers = {"Authorization": f"token {api_token}"}
         )
 
     
@@ -103,9 +194,8 @@ def get_categories(api_url, api_token ):
     api_token : str
         The personal token of the user    
     ''' 
-    response = requests.get(
-        url = api_url+"account/categories",
-        headers = {"Authorization": f"token {api_token}"}
+    response = get_client(api_token).get(
+        url = api_url+"account/categories"
         )
 
     # Retrun list of licences available together with thier IDs ( needed for metadata)   
@@ -315,9 +405,29 @@ def request_authors(file_list):
         
     return(authors_list)
 
+# header keywords that are added to the keywords of the article
+META_KEYWORDS = ('TESTTYPE', 'ANCHORTYPE', 'LOCATIONNAME', 'LOCATIONX', 'LOCATIONY', 'LOCATIONZ')
+
+
+def _header_lines(header_text):
+    ''' Returns (keyword, value) per keyword line of the header text, the value as written in the file (e.g. a
+    zero padded date or number keeps its zeros)
+    '''
+    lines = []
+    for line in header_text.split('\n'):
+        keyword, eq, value = line.lstrip(' \t').partition('=')
+        if eq and keyword.startswith('#'):
+            lines.append((keyword[1:].strip(), value.strip()))
+    return(lines)
+
+
 def retrieve_metadata(file):
     ''' Retrieves metadata fields used in 4TU upload from the .GEF file
 
+    The header is parsed once (read_gef with header_only=True) and the description is the header text up to
+    #EOH=. The text fields come from that header text as written in the file, the coordinates from the typed
+    header values. The data block is not read.
+
     Parameteres
     --------
     gef_file: str
@@ -345,53 +455,28 @@ def retrieve_metadata(file):
 #    locationz : float
 #        The depth of drilling? (LOCATIONZ)
         
-    #set up empty variables
-    art_title = ''
-    art_description = ''
-    art_keywords = []
-    art_date = ''
-    art_location = ''
-    geo_lon = ''
-    geo_lat = ''
-    company = ''
-
-    # create patterns to search text
-    title = re.compile(r'#PROJECT')
-    keywords = re.compile(r'TESTTYPE= |ANCHORTYPE= |LOCATIONNAME= |LOCATIONX= |LOCATIONY= |LOCATIONZ= ')
-    date = re.compile(r'#STARTDATE=')
-    location = re.compile(r'#LOCATIONAME= ')
-    lon = re.compile(r'#LOCATIONY= ')
-    lat = re.compile(r'#LOCATIONX= ')
-    companyid = re.compile(r'#COMPANYID= ')
-
-    #save metadata as description
-    with open (file, 'rt') as myfile:
-        art_description = myfile.read().split('#EOH=',1)[0]
+    myGef = Gef2OpenClass()
+    with open(file, 'rb') as stream:
+        # one header only parse, the data block is not read
+        myGef.read_gef(stream, header_only=True)
+        # save metadata as description: the header up to #EOH=
+        stream.seek(0)
+        header = stream.read(myGef.data_offset) if myGef.data_offset is not None else stream.read()
+    headerdict = myGef.headerdict
+    art_description = header.decode(myGef.encoding).replace('\r\n', '\n').replace('\r', '\n').split('#EOH=', 1)[0]
 
     # save metadata values as variables
-    with open (file, 'rt') as myfile:
-        for line in myfile:
-            if keywords.search(line) != None:
-                string = re.sub(r" ", "", line)
-                art_keywords.append(string.rstrip('\n').replace('#',""))
-            if title.search(line) != None:
-                art_title = line.rstrip('\n').replace('#PROJECT= ',"")
-            if date.search(line) != None:
-                dstring = re.sub(r", ", "-", line)
-                art_date = dstring.rstrip('\n').replace('#STARTDATE= ',"")
-            if location.search(line) != None:
-                art_location = line.rstrip('\n').replace('#LOCATIONAME= ',"")
-            if lon.search(line) != None:
-                geo_lon = line.rstrip('\n').replace('#LOCATIONY= ',"")
-            if lat.search(line) != None:
-                geo_lat = line.rstrip('\n').replace('#LOCATIONX= ',"")
-            if companyid.search(line) != None:
-                company = line.rstrip('\n').replace('#COMPANYID= ',"")
-    
-    # Figshare API doesn't accept long lon/lat numbers
-    geo_lat = str(round(float(geo_lat), 4))
-    geo_lon = str(round(float(geo_lon), 4))
+    header_lines = _header_lines(art_description)
+    header_values = dict(header_lines)
+    art_title = header_values.get('PROJECT', '')
+    art_keywords = [key + '=' + value.replace(' ', '') for key, value in header_lines if key in META_KEYWORDS]
+    art_date = re.sub(r'\s*,\s*', '-', header_values.get('STARTDATE', ''))
+    art_location = header_values.get('LOCATIONAME', '')
+    company = header_values.get('COMPANYID', '')
 
+    # Figshare API doesn't accept long lon/lat numbers
+    geo_lat = str(round(float(headerdict.get('LOCATIONX', [''])[0]), 4))
+    geo_lon = str(round(float(headerdict.get('LOCATIONY', [''])[0]), 4))
 
     retrieved_fields = [art_title, art_description, art_keywords, art_date, art_location,geo_lon, geo_lat,  company ]
     meta_names= ['title', 'description' , 'keywords' , 'date'  , 'location' , 'geo_lon' , 'geo_lat' , 'company' ]
@@ -474,6 +559,74 @@ def compile_metadata(collection_chosen, retrieved_dict, add_authors, env_choice)
                  "authors": add_authors
                 }
    return(article_metadata)
+
+def _preflight_one(file, add_authors, collection_chosen, env_choice):
+    ''' Validates one file and compiles its article metadata inside a worker process, returns (metadata or None, error message or None)
+    '''
+    try:
+        test_gef_anchor(file)
+        return compile_metadata(collection_chosen, retrieve_metadata(file), add_authors, env_choice), None
+    except AssertionError as e:
+        return None, str(e)
+    except Exception as e:
+        return None, 'File ' + os.path.basename(file) + ': ' + type(e).__name__ + ': ' + str(e)
+
+def preflight_upload(file_list, collection_chosen, authors_list, env_choice, processes=None, chunksize=None):
+    ''' Validates all files and compiles their article metadata in a process pool, before any network call
+
+    Every file goes through test_gef_anchor, retrieve_metadata and compile_metadata. The result is a
+    manifest of the article payloads, so the upload itself only has to send them. A file that fails
+    does not stop the others, its error is reported instead.
+
+    NOTE
+    On Windows the pool starts new interpreters, so call this from under `if __name__ == "__main__":`.
+
+    Parameters
+    ----------
+    file_list : list
+        Paths of the files to upload
+    collection_chosen : str
+        The chosen collection (e.g. 'grout')
+    authors_list : list
+        The list of additional authors per file (see request_authors)
+    env_choice : str
+        Either sandbox or production ('4TU')
+    processes : int
+        Number of worker processes, defaults to the number of CPUs. With 1 the files are prepared in this process
+    chunksize : int
+        Number of files per task sent to a worker, by default about four chunks per worker
+
+    Returns
+    ----------
+    manifest: list
+        Per file that passed, in the order of file_list: {'file', 'name', 'metadata'} with the article metadata
+        for create_article
+    errors: dict
+        Error message per file that failed
+    '''
+    prepare_one = partial(_preflight_one, collection_chosen=collection_chosen, env_choice=env_choice)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(file_list)))
+
+    if processes == 1:
+        prepared = list(map(prepare_one, file_list, authors_list))
+    else:
+        if chunksize is None:
+            chunksize = max(1, len(file_list) // (processes * 4))
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            prepared = list(pool.map(prepare_one, file_list, authors_list, chunksize=chunksize))
+
+    manifest = []
+    errors = {}
+    for file, (metadata, error) in zip(file_list, prepared):
+        if error is not None:
+            errors[file] = error
+        else:
+            manifest.append({'file': file, 'name': os.path.basename(file), 'metadata': metadata})
+
+    return(manifest, errors)
               
 def create_article(api_url, metadata_dict, api_token):
     ''' Sends the POST request to create the article
@@ -492,11 +645,10 @@ def create_article(api_url, metadata_dict, api_token):
         URL of the newly created article    
      '''
    
-    response = requests.post(
+    response = get_client(api_token).post(
         url    = f"{api_url}/account/articles",
         data   = json.dumps(metadata_dict) ,
         headers = {
-        "Authorization": f"token {api_token}",
         "Accept":       "application/json", 
         "Content-Type": "application/json" 
         })
@@ -525,9 +677,8 @@ def reserve_doi(article_url, api_token):
     article_doi: str
         DOI reserved for the article    
      '''
-    response = requests.post(
-        url = f"{article_url}/reserve_doi",
-        headers = {"Authorization": f"token {api_token}"}
+    response = get_client(api_token).post(
+        url = f"{article_url}/reserve_doi"
         )
     
     article_doi = None
@@ -561,24 +712,23 @@ def upload_dataset(article_url, api_token, file_path, file_name):
     file_size    = os.path.getsize(file_path) # checks size of file
     md5          = hashlib.md5() # define checksum method
     
-    computed_md5 = None
     with open (file_path, "rb") as stream: 
         for chunk in iter(lambda: stream.read(4096), b""):
             md5.update(chunk)
-            computed_md5 = md5.hexdigest() 
-            
-            response     = requests.post(
-                url     = f"{article_url}/files", 
-                data    = json.dumps({
-                    "name": file_name,
-                    "md5":  computed_md5,
-                    "size": file_size
-                    }),
-                headers = {
-                    "Authorization": f"token {api_token}",
-                    "Accept":       "application/json",
-                    "Content-Type": "application/json"
-                    })
+    computed_md5 = md5.hexdigest() 
+
+    # the file is registered once, with the checksum of the whole file
+    response     = get_client(api_token).post(
+        url     = f"{article_url}/files", 
+        data    = json.dumps({
+            "name": file_name,
+            "md5":  computed_md5,
+            "size": file_size
+            }),
+        headers = {
+            "Accept":       "application/json",
+            "Content-Type": "application/json"
+            })
                     
     
     file_url = None
@@ -588,10 +738,9 @@ def upload_dataset(article_url, api_token, file_path, file_name):
         sys.exit("Couldn't create file.")
 
 ## GET UPLOAD METADATA
-    response = requests.get(
+    response = get_client(api_token).get(
         url   = file_url,
         headers = {
-            "Authorization": f"token {api_token}",
             "Accept":       "application/json",
         })
 
@@ -600,10 +749,9 @@ def upload_dataset(article_url, api_token, file_path, file_name):
     upload_token = file_data["upload_token"]
     upload_url   = file_data["upload_url"]
 
-    response = requests.get(
+    response = get_client(api_token).get(
         url = upload_url,
         headers = {
-            "Authorization": f"token {api_token}",
             "Accept":       "application/json",
         })
         
@@ -621,10 +769,9 @@ def upload_dataset(article_url, api_token, file_path, file_name):
         print(f"Uploading part {part_number} ({number_of_bytes} bytes).")
         file_stream.seek(start_position)
         chunk    = file_stream.read(number_of_bytes)
-        response = requests.put(
+        response = get_client(api_token).put(
             url = f"{upload_url}/{part_number}",
             headers = {
-                "Authorization": f"token {api_token}",
                 "Accept":       "application/json",
             },
             data = chunk)
@@ -633,19 +780,17 @@ def upload_dataset(article_url, api_token, file_path, file_name):
 
 
 # CHECK NEW FILE STATUS
-    response = requests.get(
+    response = get_client(api_token).get(
         url = upload_url,
         headers = {
-            "Authorization": f"token {api_token}",
             "Accept":       "application/json",
             })
     upload_metadata = response.json()
 
 # FINALIZE UPLOAD
-    response = requests.post(
+    response = get_client(api_token).post(
         url     = f"{article_url}/files/{file_id}",
         headers = {
-            "Authorization": f"token {api_token}",
             "Accept":       "application/json",
         })
 
@@ -672,9 +817,8 @@ def publish_article(article_url, api_token):
         Personal token to access API    
     ''' 
     
-    response = requests.post(
-        url = f"{article_url}/publish",
-        headers = {"Authorization": f"token {api_token}"}
+    response = get_client(api_token).post(
+        url = f"{article_url}/publish"
         )
 
     if response.status_code == 201: 
@@ -725,10 +869,10 @@ def add_to_collection( collection_chosen, article_url, api_token, env_choice):
 
 
     # ADD THE ARTICLE TO A PRIVATE COLLECTION
-    response = requests.post(
+    response = get_client(api_token).post(
         url = f"{collection_url}articles",
         data   = json.dumps({  "articles": article_id}),
-        headers = {"Authorization": f"token {api_token}",
+        headers = {
                     "Accept":       "application/json",
                     "Content-Type": "application/json"
                     })
@@ -759,9 +903,8 @@ def publish_collection( collection_url, api_token):
     api_token: str
         Personal token to access API    
     ''' 
-    response = requests.post(
-        url = f"{collection_url}publish",
-        headers = {"Authorization": f"token {api_token}"}
+    response = get_client(api_token).post(
+        url = f"{collection_url}publish"
         )
 
     if response.status_code == 201: 
@@ -773,6 +916,10 @@ def publish_collection( collection_url, api_token):
 def test_gef_anchor(GEF_file):
     ''' Tests if GEF type is correct
 
+    The checks run while the file is parsed (see Gef2OpenClass.read_gef(validate=...)): the convention of its
+    REPORTCODE and the acceptance rules of the upload (gefreader.UPLOAD_RULES). A file that fails a header
+    check is rejected before its data block is read. All failed checks are reported.
+
     Parameters
     ----------
     GEF_file: str
@@ -780,26 +927,11 @@ def test_gef_anchor(GEF_file):
     
     '''
     myGef = Gef2OpenClass()
-    myGef.read_gef(GEF_file)
-    if myGef.test_gef():
-        print('Datafile adheres to {} convention'.format(myGef.headerdict['REPORTCODE'][0]))
-
-    assert 'LOCATIONAME' in myGef.headerdict , 'File ' + os.path.basename(GEF_file) + ': field LOCATIONAME missing'
-    assert 'LOCATIONX'   in myGef.headerdict , 'File ' + os.path.basename(GEF_file) + ': field LOCATIONX missing'
-    assert 'LOCATIONY'   in myGef.headerdict , 'File ' + os.path.basename(GEF_file) + ': field LOCATIONY missing'
-    assert 'LOCATIONZ'   in myGef.headerdict , 'File ' + os.path.basename(GEF_file) + ': field LOCATIONZ missing'
-    assert 'TESTTYPE'    in myGef.headerdict , 'File ' + os.path.basename(GEF_file) + ': field TESTTYPE missing'
-    assert 'STARTDATE'   in myGef.headerdict , 'File ' + os.path.basename(GEF_file) + ': field STARTDATE missing'
-    assert 'ANCHORTYPE'  in myGef.headerdict , 'File ' + os.path.basename(GEF_file) + ': field ANCHORTYPE missing'
-
-    assert re.search('[a-zA-Z]+',  myGef.headerdict['LOCATIONAME'][0] ), 'File ' + os.path.basename(GEF_file) + ': field LOCATIONAME cannot be empty'
-    assert is_number(myGef.headerdict['LOCATIONX'][0]),   'File ' + os.path.basename(GEF_file) + ': field LOCATIONX should be a number'
-    assert myGef.headerdict['LOCATIONX'][0]>=-180 and myGef.headerdict['LOCATIONX'][0]<=180,   'File ' + os.path.basename(GEF_file) + ': field LOCATIONX should be within a range of -180 to 180'
-    assert is_number(myGef.headerdict['LOCATIONY'][0]),   'File ' + os.path.basename(GEF_file) + ': field LOCATIONY should be a number'
-    assert myGef.headerdict['LOCATIONY'][0]>=-90 and myGef.headerdict['LOCATIONY'][0]<=90,   'File ' + os.path.basename(GEF_file) + ': field LOCATIONY should be within a range of -90 to 90'
-    assert is_number(myGef.headerdict['LOCATIONZ'][0]),   'File ' + os.path.basename(GEF_file) + ': field LOCATIONZ should be a number'
-    assert re.search('investigation|suitability|acceptance',  myGef.headerdict['TESTTYPE'][0] ), 'File ' + os.path.basename(GEF_file) + ': field TESTTYPE should have one of the following values: \n - investigation\n - suitability\n - acceptance'
-    assert re.search('self-drilling|stranded|screw injection',  myGef.headerdict['ANCHORTYPE'][0] ), 'File ' + os.path.basename(GEF_file) + ': field ANCHORTYPE should have one of the following values: \n - self-drilling\n - stranded\n - screw injection'
+    read = myGef.read_gef(GEF_file, validate=UPLOAD_RULES, fail_fast=True)
+    errors = [finding.message for finding in myGef.findings if finding.severity == 'error']
+    assert not errors, 'File ' + os.path.basename(GEF_file) + ': ' + '\n'.join(errors)
+    assert read, 'File ' + os.path.basename(GEF_file) + ': could not be read'
+    print('Datafile adheres to {} convention'.format(myGef.headerdict['REPORTCODE'][0]))
 
 # Functions to browse and retrieve files
 def browse_collection(collection_chosen, api_url, api_token):
@@ -834,10 +966,9 @@ def browse_collection(collection_chosen, api_url, api_token):
     }
     
     #request articles based on search parameters set above
-    response = requests.post(
+    response = get_client(api_token).post(
         url = f"{api_url}/articles/search",
-        json = params,
-        headers = {"Authorization": f"token {api_token}"} 
+        json = params
     )
     
 
@@ -873,9 +1004,8 @@ def get_article_details(article_ids,api_url, api_token ):
     '''
     art = []
     for art_id in article_ids:
-        response = requests.get(
-            url = f"{api_url}/articles/" + str(art_id),
-            headers = {"Authorization": f"token {api_token}"})
+        response = get_client(api_token).get(
+            url = f"{api_url}/articles/" + str(art_id))
         art.append(pd.json_normalize(response.json()))
    
     if response.status_code >= 200 & response.status_code < 300 :  
@@ -1064,9 +1194,8 @@ def download_files(files, api_url, api_token):
 
     for index, file in files.iterrows():
         file_name = file['name']
-        response = requests.get(
-            url = f"{api_url}/file/download/" + str(file['id']),
-            headers = {"Authorization": f"token {api_token}"})
+        response = get_client(api_token).get(
+            url = f"{api_url}/file/download/" + str(file['id']))
         if response.status_code == 200: 
             open(os.path.join(file_location, file_name) , "wb").write(response.content)
             if os.path.exists(os.path.join(file_location, file_name)): 
@@ -1076,6 +1205,35 @@ def download_files(files, api_url, api_token):
         else:    
             print("The file ID ", file['id'], ": ", file_name, " couldn't be retrieved.")    
 
+def download_gef(file_id, api_url, api_token):
+    '''
+    Downloads a GEF file and parses it in memory, without saving it to disk first
+
+    Parameters
+    ----------
+    file_id: int
+        ID of the file to download
+    api_url: str
+        API URL
+    api_token: str
+        Personal token to access API
+    Returns
+    ---------
+    myGef: Gef2OpenClass
+        The parsed file, or None when the file couldn't be retrieved or read
+    '''
+    response = get_client(api_token).get(
+        url = f"{api_url}/file/download/" + str(file_id))
+    if response.status_code != 200:
+        print("The file ID ", file_id, " couldn't be retrieved.")
+        return None
+
+    myGef = Gef2OpenClass()
+    if not myGef.read_gef(response.content):
+        print("The file ID ", file_id, " couldn't be read.")
+        return None
+    return(myGef)
+
 def choose_filter(filter_name, choice_list):
     '''
     Function to filter the results by specific keyword
@@ -1138,10 +1296,9 @@ def filter_articles(collection_chosen, article_url, api_token):
     }
 
     #request articles based on search parameters set above
-    response = requests.post(
+    response = get_client(api_token).post(
         url = article_url,
-        json = params,
-        headers = {"Authorization": f"token {api_token}"} 
+        json = params
     )
 
     #store response as a json object
@@ -92,6 +92,14 @@ app_ui = ui.page_fluid(
 )
 
 def server(input, output, session):
+    # tokens whose client get_client keeps for this session, closed when the session ends
+    session_tokens = set()
+
+    def release_session_clients():
+        for api_token in session_tokens:
+            release_client(api_token)
+
+    session.on_ended(release_session_clients)
 
     @reactive.Effect
     @reactive.event(input.checkID)
@@ -129,11 +137,13 @@ def server(input, output, session):
 
     @reactive.Calc
     def auth_successful():
-        response = requests.get(
-        url = api_url()+"account/licenses", # private licences list
-        headers = {"Authorization": f"token {input.api_token()}"}
-        )
+        # a client of its own, a token that is tried here is not kept by get_client
+        with FigshareClient(input.api_token()) as client:
+            response = client.get(
+            url = api_url()+"account/licenses", # private licences list
+            )
         if response.status_code==200:
+            session_tokens.add(input.api_token())
             return('Authorisation Successful') 
         elif response.status_code==403 and  'code' in  response.json() and  response.json()['code'] ==  'OAuthInvalidToken':
             return('Invalid Token. Please provide a valid 4TUResearchData token')
@@ -380,30 +390,23 @@ def server(input, output, session):
             file_paths= [d['datapath'] for d in good_files_infos() if 'datapath' in d] 
             file_names= [d['name'] for d in good_files_infos()  if 'name' in d]
             author_list =  authors_list()
-            retrieved_meta = []
-            article_meta = []
             n_files = len(file_paths)
 
             with ui.Progress( min = 0, max = n_files ) as p:
-                p.set(message="Computing", detail="This may take a while...")
-            
-                for i, file in enumerate(file_paths):   
-                    p.set(i,message=f"Preparing file {i+1} out of {n_files}", 
-                            detail="Testing GEF file standard...")
-                    
-                    print('\n Preparing file ', i+1 , 'out of ', n_files ,'\n')
-                    test_gef_anchor(file)
-                    
-                    if not article_url:
-                        ui.notification_show(f"Couldn't create the dataset {file_names[i]}",  type = 'error' )
-                        return
-
-                    p.set(i,detail="Compiling metadata from file...")
-                    retrieved_meta.append(retrieve_metadata(file))
-                    article_meta.append(compile_metadata(input.collection(), retrieved_meta[i], author_list[i], env_choice() ))
-
-                    p.set(i,detail="Creating article on 4TU...")
-                    article_url = create_article(api_url(), article_meta[i], input.api_token() )
+                p.set(message="Computing", detail="Testing GEF file standard and compiling metadata...")
+
+                # Pre-flight: all files are tested and their metadata compiled before anything is sent
+                manifest, errors = preflight_upload(file_paths, input.collection(), author_list, env_choice())
+                if errors:
+                    for file, error in errors.items():
+                        ui.notification_show(f"{file_names[file_paths.index(file)]}: {error}",  type = 'error' )
+                    return
+
+                for i, item in enumerate(manifest):
+                    file = item['file']
+                    p.set(i,message=f"Uploading file {i+1} out of {n_files}", 
+                            detail="Creating article on 4TU...")
+                    article_url = create_article(api_url(), item['metadata'], input.api_token() )
                     
                     if not article_url:
                         ui.notification_show(f"Couldn't create the dataset {file_names[i]}",  type = 'error' )
@@ -1,7 +1,17 @@
 # gefreader.py example based on: https://github.com/creepywaterbug/Gef2Open/blob/master/Gef2Open.py
 
+import contextlib
+import datetime
+import io
+import mmap
 import re
 import os
+import sys
+import time
+from collections import namedtuple
+from collections.abc import Mapping
+
+import numpy as np
 
 
 # Hulpfuncties
@@ -19,92 +29,749 @@ def removetrailers(string):
     return e
 
 
+# Parameters die per index (eerste waarde) in een sub-dictionary worden opgeslagen
+MULTIPARS = ['COLUMNINFO', 'COLUMNVOID', 'MEASUREMENTTEXT', 'MEASUREMENTVAR', 'SPECIMENVAR', 'SPECIMENTEXT']
+
+# Voorgecompileerde patronen voor de single-pass tokenizer (engine='fast')
+_PAR_RE = re.compile('^#([^ \t]*)[ \t]*$')            # '#KEYWORD' voor het '='-teken
+_KEYINFO_SPLIT_RE = re.compile('[ \t]*,[ \t]*')       # ',' inclusief omringende witruimte
+_DATA_SPLIT_RE = re.compile('[; \t\n]')               # scheidingstekens in een dataregel
+_CR_SPLIT_RE = re.compile(b'(?<=\r)(?!\n)')           # splitst na een losse '\r' (oud Mac regeleinde)
+
+# Coderingen die worden geprobeerd als read_gef geen encoding krijgt: de eerste waarmee de hele header
+# te decoderen is wordt gebruikt. cp1252 is de gebruikelijke codering van (Nederlandse) Windows software,
+# latin-1 kan alles decoderen.
+ENCODINGS = ('utf-8-sig', 'cp1252', 'latin-1')
+
+@contextlib.contextmanager
+def _open_source(source):
+    # Binair bestandsobject voor een pad, bytes/bytearray/memoryview of een binair file-like object
+    # (bv een upload of een gedownloade response). Objecten van de aanroeper worden niet gesloten.
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield f
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    elif isinstance(source, io.TextIOBase):
+        raise TypeError('GEF file objects should be opened in binary mode')
+    elif hasattr(source, 'read'):
+        # de header wordt opnieuw gelezen als de codering niet klopt, daarvoor moet seek() werken
+        if isinstance(source, io.BufferedIOBase) and source.seekable():
+            yield source
+        else:
+            yield io.BytesIO(source.read())
+    else:
+        raise TypeError('Expected a path, bytes or a binary file object, not %s' % type(source).__name__)
+
+
+def _source_name(source):
+    # Naam van de bron voor meldingen
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(source)
+    return getattr(source, 'name', '<%s>' % type(source).__name__)
+
+
+def _to_value(s):
+    # float als dat kan, anders de string zelf (is_number + float in een keer)
+    try:
+        return float(s)
+    except ValueError:
+        return s
+
+
+def _split_par(linetmp):
+    # Geeft (par, heeft '=', tekst na '=') zoals de legacy parser die afleidt
+    line0, eq, rest = linetmp.partition('=')
+    if '\n' in line0:
+        # regel zonder '=': '$' matcht dan ook voor de afsluitende newline
+        return _PAR_RE.sub('\\1', line0), eq, rest
+    m = _PAR_RE.match(line0)
+    if m is None:
+        return line0, eq, rest
+    return m.group(1), eq, rest
+
+
+def _parse_data_line(data):
+    # Tokenizer voor een regel uit het data block, gelijk aan de legacy bewerkingen
+    if ';' in data or "'" in data or '"' in data:
+        data = data.replace(';!', '').replace("'", '').replace('"', '')
+        tokens = _DATA_SPLIT_RE.split(data.strip())
+    else:
+        data = data.strip()
+        if '\t' in data:
+            tokens = _DATA_SPLIT_RE.split(data)
+        else:
+            tokens = data.split(' ')
+    try:
+        return [float(i) for i in tokens]
+    except ValueError:
+        return [_to_value(i) for i in tokens]
+
+
+class _RowBuffer:
+    # Groeiende 2-D array voor tail mode: nieuwe rijen komen in vrije ruimte achter de gelezen rijen, zodat
+    # een refresh() niet alle eerder gelezen rijen kopieert. Bij een volle buffer wordt de capaciteit
+    # verdubbeld (een kopie per verdubbeling). rows is een view op de gevulde rijen.
+    def __init__(self, ncols, dtype=np.float64, fill=np.nan):
+        self.fill = fill
+        self._data = np.full((0, ncols), fill, dtype=dtype)
+        self.rows = self._data[:0]
+
+    def append(self, new_rows):
+        n = len(self.rows)
+        ncols = max(self._data.shape[1], new_rows.shape[1])
+        if n + len(new_rows) > len(self._data) or ncols > self._data.shape[1]:
+            capacity = max(2 * len(self._data), n + len(new_rows), 1024)
+            data = np.full((capacity, ncols), self.fill, dtype=self._data.dtype)
+            data[:n, :self._data.shape[1]] = self.rows
+            self._data = data
+        self._data[n:n + len(new_rows), :new_rows.shape[1]] = new_rows
+        self.rows = self._data[:n + len(new_rows)]
+        return self.rows
+
+
+def _separators(headerdict):
+    # Geeft (kolom scheidingsteken, record scheidingsteken) uit #COLUMNSEPARATOR en #RECORDSEPARATOR,
+    # of None als het bestand ze niet opgeeft of #DATAFORMAT geen ASCII is. Witruimte als
+    # scheidingsteken wordt None: dan wordt op spaties en tabs gesplitst.
+    dataformat = headerdict.get('DATAFORMAT')
+    if dataformat and str(dataformat[0]).strip().upper() != 'ASCII':
+        return None
+    separators = []
+    for keyword in ('COLUMNSEPARATOR', 'RECORDSEPARATOR'):
+        # de header parser splitst op ',': een ',' als scheidingsteken komt terug als ['', '\n']
+        separator = ','.join(str(i) for i in headerdict.get(keyword, [])).strip()
+        separators.append(separator if len(separator) == 1 else None)
+    if separators == [None, None]:
+        return None
+    return tuple(separators)
+
+
+def _encode_separators(separators):
+    # Scheidingstekens als bytes, voor de tokenizers die het data block niet decoderen. Een scheidingsteken is
+    # een byte, dus niet met de codering van de header (utf-8-sig zou er een BOM voor zetten) maar als latin-1,
+    # zoals numpy bytes leest
+    if separators is None:
+        return None
+    return tuple(separator.encode('latin-1') if separator else None for separator in separators)
+
+
+def _decode_data(data, encoding):
+    # Decodeert (een deel van) het data block met de codering van de header. De codering is alleen op de header
+    # bepaald: past het data block er niet in (bv een cp1252 teken in een tekst kolom onder een ASCII header),
+    # dan de volgende codering uit ENCODINGS, met latin-1 als laatste
+    try:
+        return data.decode(encoding)
+    except UnicodeDecodeError:
+        pass
+    fallbacks = ENCODINGS[ENCODINGS.index(encoding) + 1:] if encoding in ENCODINGS else ENCODINGS
+    for fallback in fallbacks[:-1]:
+        try:
+            return data.decode(fallback)
+        except UnicodeDecodeError:
+            pass
+    return data.decode(ENCODINGS[-1])
+
+
+def _separated_line_parser(column_separator, record_separator):
+    # Tokenizer voor dataregels met gedeclareerde scheidingstekens: een strip en split per regel, geen regex
+    trailing = ' \t' + (column_separator or '') + (record_separator or '')
+
+    def parse(data):
+        tokens = data.strip().rstrip(trailing).split(column_separator)
+        try:
+            return [float(i) for i in tokens]
+        except ValueError:
+            return [_to_value(i.strip().replace("'", '').replace('"', '')) for i in tokens]
+    return parse
+
+
+def _parse_data_array(data, ncols=0, separators=None):
+    # Bulk conversie van het data block (bytes, niet gedecodeerd) naar een 2-D float64 array
+    # (read_gef(..., as_array=True)); separators zijn de scheidingstekens als bytes
+    column_separator, record_separator = separators or (None, None)
+    if b'\r' in data:
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    if record_separator:
+        data = data.replace((column_separator or b'') + record_separator, b'').replace(record_separator, b'')
+    if column_separator:
+        if b"'" in data or b'"' in data:
+            data = data.replace(b"'", b'').replace(b'"', b'')
+    elif b';' in data or b"'" in data or b'"' in data:
+        data = data.replace(b';!', b'').replace(b"'", b'').replace(b'"', b'').replace(b';', b' ')
+    if data.strip() == b'':
+        return np.empty((0, ncols), dtype=np.float64)
+    try:
+        # numpy leest bytes als latin-1, het scheidingsteken moet dan ook zo worden opgegeven
+        return np.loadtxt(io.BytesIO(data), dtype=np.float64, comments=None, ndmin=2,
+                          delimiter=column_separator.decode('latin-1') if column_separator else None)
+    except ValueError:
+        pass
+    # Fallback voor afwijkende regels: ontbrekende en niet-numerieke waarden worden NaN
+    if column_separator:
+        rows = [line.rstrip(b' \t' + column_separator).split(column_separator)
+                for line in data.splitlines() if line.strip()]
+    else:
+        rows = [line.split() for line in data.splitlines()]
+        rows = [row for row in rows if row]
+    out = np.full((len(rows), max(ncols, max(len(row) for row in rows))), np.nan)
+    for i, row in enumerate(rows):
+        for j, value in enumerate(row):
+            value = _to_value(value)
+            if isinstance(value, float):
+                out[i, j] = value
+    return out
+
+
+class LazyDatablok(Mapping):
+    """
+    Data block dat pas bij opvragen wordt gedecodeerd (read_gef(..., lazy=True)).
+
+    Het bestand is memory-mapped en per rij zijn de byte posities bekend, zodat een rij
+    direct kan worden gelezen zonder de voorgaande rijen te parsen. Rijen zijn 1-based,
+    net als de dictionary van de gewone parser; gedecodeerde rijen worden bewaard.
+    """
+
+    def __init__(self, mm, starts, ends, encoding, separators=None):
+        self._mm = mm
+        self._starts = starts
+        self._ends = ends
+        self.encoding = encoding
+        self.separators = separators
+        self._parse_line = _parse_data_line if separators is None else _separated_line_parser(*separators)
+        self._byte_separators = _encode_separators(separators)
+        self._rows = {}
+
+    @classmethod
+    def from_file(cls, f, data_offset, encoding, separators=None):
+        # Bouwt de rij-index voor het data block vanaf data_offset in het (binaire) bestand f
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if data_offset >= len(mm):
+            empty = np.empty(0, dtype=np.int64)
+            return cls(mm, empty, empty, encoding, separators)
+        buf = np.frombuffer(mm, dtype=np.uint8, offset=data_offset)
+        n = len(buf)
+        is_nl = buf == 10
+        is_cr = buf == 13
+        is_cr[:-1] &= ~is_nl[1:]  # losse '\r' is in tekst modus ook een regeleinde
+        ends = np.flatnonzero(is_nl | is_cr)
+        if len(ends) == 0 or ends[-1] != n - 1:
+            ends = np.append(ends, n)  # laatste regel zonder regeleinde
+        starts = np.concatenate(([0], ends[:-1] + 1))
+        # lege regels (alleen spaties, tabs en regeleinden) uitsluiten: een regel blijft als er van zijn begin
+        # tot het begin van de volgende regel (de regel met zijn regeleinde) een ander teken staat
+        text = (buf != 9) & (buf != 10) & (buf != 13) & (buf != 32)
+        keep = np.logical_or.reduceat(text, starts)
+        del buf, text  # geen views op de mmap laten staan
+        return cls(mm, starts[keep] + data_offset, ends[keep] + data_offset, encoding, separators)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __iter__(self):
+        return iter(range(1, len(self._starts) + 1))
+
+    def __contains__(self, iRij):
+        try:
+            return int(iRij) == iRij and 1 <= iRij <= len(self._starts)
+        except (TypeError, ValueError):
+            return False
+
+    def __getitem__(self, iRij):
+        if iRij not in self:
+            raise KeyError(iRij)
+        iRij = int(iRij)
+        row = self._rows.get(iRij)
+        if row is None:
+            line = self._line(iRij - 1)
+            linetmp = line.lstrip(' \t')
+            if linetmp[0] == '#' or '=' in linetmp:
+                # net als bij het lezen van tekst hoort het regeleinde bij de regel
+                if self._ends[iRij - 1] < len(self._mm):
+                    linetmp = (linetmp[:-1] if linetmp.endswith('\r') else linetmp) + '\n'
+                linetmp = _split_par(linetmp)[0]
+            row = self._rows[iRij] = self._parse_line(linetmp)
+        return row
+
+    def _line(self, index):
+        return _decode_data(self._mm[self._starts[index]:self._ends[index]], self.encoding)
+
+    # Purpose: Decodeert rij iStart t/m iStop (1-based, inclusief) in een keer naar een 2-D float64 array
+    def to_array(self, iStart=1, iStop=None):
+        if iStop is None:
+            iStop = len(self)
+        if iStop < iStart:
+            return np.empty((0, 0), dtype=np.float64)
+        start = self._starts[iStart - 1]
+        stop = self._ends[iStop - 1]
+        return _parse_data_array(self._mm[start:stop], separators=self._byte_separators)
+
+    def close(self):
+        self._rows = {}
+        self._mm.close()
+
+
+# Waarden die de getters van Gef2OpenClass teruggeven: (attribuut, keyword, index, minimaal aantal waarden)
+_HEADER_VALUES = (
+    ('column', 'COLUMN', 0, 1),
+    ('companyid_name', 'COMPANYID', 0, 1),
+    ('nr_scans', 'LASTSCAN', 0, 1),
+    ('parent_reference', 'PARENT', 0, 1),
+    ('procedurecode_code', 'PROCEDURECODE', 0, 1),
+    ('projectid_number', 'PROJECTID', 1, 2),
+    ('reportcode_code', 'REPORTCODE', 0, 1),
+    ('xyid_x', 'XYID', 1, 1),
+    ('xyid_y', 'XYID', 2, 2),
+    ('zid_z', 'ZID', 1, 2),
+    ('testid', 'TESTID', 0, 1),
+)
+
+# Flags van Gef2OpenClass: (attribuut, keyword, minimaal aantal waarden, waarde als het keyword ontbreekt)
+_HEADER_FLAGS = (
+    ('companyid_flag', 'COMPANYID', 1, False),
+    ('column_flag', 'COLUMN', 1, False),
+    ('parent_flag', 'PARENT', 1, False),
+    ('procedurecode_flag', 'PROCEDURECODE', 1, False),
+    ('projectid_flag', 'PROJECTID', 1, None),
+    ('reportcode_flag', 'REPORTCODE', 1, False),
+    ('startdate_flag', 'STARTDATE', 3, False),
+    ('xyid_flag', 'XYID', 3, None),
+    ('zid_flag', 'ZID', 1, False),
+)
+
+
+def _header_value(headerdict, keyword, index, minimum):
+    # Waarde zoals de oorspronkelijke getters die geven, of de foutmelding
+    values = headerdict.get(keyword)
+    if values is None:
+        return 'Error:MissingKeyword'
+    if len(values) < max(minimum, index + 1):
+        return 'Error:MissingValue'
+    return values[index]
+
+
+def _header_float(headerdict, keyword, index):
+    # Numerieke waarde als float, anders None
+    values = headerdict.get(keyword)
+    if values is None or len(values) <= index or not isinstance(values[index], float):
+        return None
+    return values[index]
+
+
+class GefHeader:
+    """
+    Compacte, getypeerde header van een GEF bestand, een keer gevuld bij het parsen (Gef2OpenClass.header).
+
+    De attributen met de naam van een getter (bv companyid_name, xyid_x, startdate_yyyy) bevatten precies
+    wat die getter teruggeeft, inclusief 'Error:...' meldingen. Daarnaast zijn er getypeerde waarden:
+    x, y en z als float (None als ze ontbreken), startdate als datetime.date en per kolom uit #COLUMNINFO
+    de arrays column_numbers, column_quantities en column_voids (NaN als er geen waarde is) en de tuples
+    column_units en column_names. quantity_columns koppelt ieder GEF quantity number aan zijn kolomnummer
+    (de eerste kolom telt), met apart penetration_length_column (quantity 1), corrected_depth_column
+    (quantity 11) en depth_column: de gecorrigeerde diepte als die er is, anders de sondeerlengte. Alleen in
+    GEF-CPT-Report bestanden (is_cpt) zijn dat diepten; andere conventies gebruiken de quantity numbers voor
+    andere grootheden (bv LOAD in GEF-Anker-data) en daar zijn deze drie attributen None.
+    De header verwijst niet naar de headerdict en gebruikt __slots__, zodat de headers van tienduizenden
+    bestanden in geheugen kunnen blijven zonder de rest van de bestanden.
+    """
+
+    __slots__ = tuple(name for name, *_ in _HEADER_VALUES) + tuple(name for name, *_ in _HEADER_FLAGS) + (
+        'is_bore', 'is_cpt', 'startdate_yyyy', 'startdate_mm', 'startdate_dd',
+        'x', 'y', 'z', 'startdate', 'column_numbers', 'column_units', 'column_names',
+        'column_quantities', 'column_voids', 'quantity_columns', 'penetration_length_column',
+        'corrected_depth_column', 'depth_column')
+
+    def __init__(self, headerdict):
+        for name, keyword, index, minimum in _HEADER_VALUES:
+            setattr(self, name, _header_value(headerdict, keyword, index, minimum))
+        for name, keyword, minimum, missing in _HEADER_FLAGS:
+            values = headerdict.get(keyword)
+            setattr(self, name, missing if values is None else len(values) >= minimum)
+
+        # PROCEDURECODE gaat voor REPORTCODE
+        code = headerdict.get('PROCEDURECODE', headerdict.get('REPORTCODE', ()))
+        self.is_bore = 'GEF-BORE-Report' in code
+        self.is_cpt = 'GEF-CPT-Report' in code
+
+        parts = [_header_value(headerdict, 'STARTDATE', 0, 3)] * 3
+        if self.startdate_flag:
+            for i, value in enumerate(headerdict['STARTDATE'][:3]):
+                try:
+                    parts[i] = int(value)
+                except (TypeError, ValueError, OverflowError):
+                    parts[i] = 'Error:MissingValue'
+        self.startdate_yyyy, self.startdate_mm, self.startdate_dd = parts
+        try:
+            self.startdate = datetime.date(*parts)
+        except (TypeError, ValueError, OverflowError):
+            self.startdate = None
+
+        self.x = _header_float(headerdict, 'XYID', 1)
+        self.y = _header_float(headerdict, 'XYID', 2)
+        self.z = _header_float(headerdict, 'ZID', 1)
+
+        columns = [(key, info) for key, info in headerdict.get('COLUMNINFO', {}).items() if isinstance(key, int)]
+        voids = headerdict.get('COLUMNVOID', {})
+        self.column_numbers = np.array([key for key, _ in columns], dtype=np.int32)
+        self.column_units = tuple(str(info[1]).strip() if len(info) > 1 else '' for _, info in columns)
+        self.column_names = tuple(str(info[2]).strip() if len(info) > 2 else '' for _, info in columns)
+        self.column_quantities = np.array(
+            [info[3] if len(info) > 3 and isinstance(info[3], float) else np.nan for _, info in columns])
+        self.column_voids = np.array(
+            [voids[key][1] if len(voids.get(key, ())) > 1 and isinstance(voids[key][1], float) else np.nan
+             for key, _ in columns])
+
+        self.quantity_columns = {}
+        for key, info in columns:
+            if len(info) > 3 and isinstance(info[3], float) and info[3].is_integer():
+                self.quantity_columns.setdefault(int(info[3]), key)
+        # alleen in GEF-CPT-Report zijn quantity 1 en 11 een diepte, in andere conventies zijn ze None
+        self.penetration_length_column = self.quantity_columns.get(1) if self.is_cpt else None
+        self.corrected_depth_column = self.quantity_columns.get(11) if self.is_cpt else None
+        if self.corrected_depth_column is not None:
+            self.depth_column = self.corrected_depth_column
+        else:
+            self.depth_column = self.penetration_length_column
+
+
+class ReadStats:
+    """
+    Meting per fase van een read_gef (read_gef(..., profile=...), Gef2OpenClass.stats).
+
+    Fasen: 'io' (lezen uit het bestand), 'header' (tokenizen van de header), 'multipar' (de MULTIPARS
+    zoals #COLUMNINFO en #MEASUREMENTTEXT) en 'data' (omzetten van het data block). Per fase in phases:
+    seconds (wall time), blocks (toename van sys.getallocatedblocks(), de Python objecten die na de fase
+    nog bestaan), lines en tokens (waarden). Een fase die binnen een andere valt (io tijdens de header) telt
+    alleen bij zichzelf, zodat de fasen samen total_seconds benaderen. Bij het herkennen van de codering
+    kan de header meer dan een keer worden gelezen, die pogingen tellen mee. bytes_read is het aantal
+    gelezen bytes. as_dict() geeft alles als gewone dictionary, bv om over bestanden op te tellen.
+    """
+
+    PHASES = ('io', 'header', 'multipar', 'data')
+
+    def __init__(self, bestand=None):
+        self.bestand = bestand
+        self.phases = {phase: {'seconds': 0.0, 'blocks': 0, 'lines': 0, 'tokens': 0} for phase in self.PHASES}
+        self.bytes_read = 0
+        self.total_seconds = 0.0
+
+    def start(self, nested=()):
+        # Begin van een meting; de fasen in nested die tijdens de meting worden geteld gaan er later vanaf
+        return (time.perf_counter(), sys.getallocatedblocks(),
+                [(self.phases[phase]['seconds'], self.phases[phase]['blocks']) for phase in nested], nested)
+
+    def stop(self, phase, started, lines=0, tokens=0):
+        seconds = time.perf_counter() - started[0]
+        blocks = sys.getallocatedblocks() - started[1]
+        for (nested_seconds, nested_blocks), nested in zip(started[2], started[3]):
+            seconds -= self.phases[nested]['seconds'] - nested_seconds
+            blocks -= self.phases[nested]['blocks'] - nested_blocks
+        record = self.phases[phase]
+        record['seconds'] += seconds
+        record['blocks'] += blocks
+        record['lines'] += lines
+        record['tokens'] += tokens
+
+    def timed_lines(self, f):
+        # Regels uit f waarbij alleen het lezen zelf bij 'io' telt
+        lines = iter(f)
+        while True:
+            started = self.start()
+            raw = next(lines, None)
+            if raw is None:
+                self.stop('io', started)
+                return
+            self.bytes_read += len(raw)
+            self.stop('io', started, lines=1)
+            yield raw
+
+    def read(self, f):
+        # f.read() als 'io'
+        started = self.start()
+        data = f.read()
+        self.bytes_read += len(data)
+        self.stop('io', started)
+        return data
+
+    def as_dict(self):
+        return {'bestand': self.bestand, 'total_seconds': self.total_seconds, 'bytes_read': self.bytes_read,
+                'phases': {phase: dict(record) for phase, record in self.phases.items()}}
+
+    def __repr__(self):
+        return 'ReadStats(%s)' % ', '.join('%s=%.4fs' % (phase, record['seconds'])
+                                           for phase, record in self.phases.items())
+
+
+def _count_tokens(datablok):
+    # Aantal waarden in het data block; een LazyDatablok is nog niet getokenized
+    if isinstance(datablok, np.ndarray):
+        return datablok.size
+    if isinstance(datablok, LazyDatablok):
+        return 0
+    return sum(len(row) for row in datablok.values())
+
+
+# Bevinding van de validatie tijdens het parsen (read_gef(..., validate=...)): severity is 'error' als het
+# bestand niet voldoet aan de conventie van zijn REPORTCODE, anders 'warning'
+Finding = namedtuple('Finding', ('severity', 'keyword', 'message'))
+
+# Validatie regels per REPORTCODE, de enige definitie voor read_gef(..., validate=...), test_gef en gefrules
+# (gecompileerd tot een RuleSet per conventie, zie compile_rules). Per conventie:
+#   required: verplichte keywords
+#   text:     keywords waarvan de eerste waarde letters moet bevatten
+#   ranges:   keywords waarvan de eerste waarde een getal moet zijn, binnen (minimum, maximum), None is onbegrensd
+#   enums:    keywords waarvan de eerste waarde een van de opgegeven waarden moet bevatten
+#   counts:   {keyword: multipar}, de eerste waarde van keyword is het aantal indices van de multipar
+#   rows:     keyword waarvan de eerste waarde het aantal rijen is, het bestand moet dan een data block hebben
+# UPLOAD_RULES is geen conventie maar de acceptatie eisen van een upload naar de anker collectie
+# (test_gef_anchor, preflight_upload). Geen bestand heeft die REPORTCODE, de regels gelden alleen met
+# read_gef(..., validate=UPLOAD_RULES), bovenop die van de eigen #REPORTCODE.
+UPLOAD_RULES = 'upload'
+
+RULES = {
+    'GEF-BORE-Report': {},
+    'GEF-CPT-Report': {
+        'required': ('GEFID', 'COMPANYID', 'FILEDATE', 'FILEOWNER', 'PROJECTID', 'TESTID', 'ZID',
+                     'COLUMN', 'COLUMNINFO', 'COLUMNVOID', 'LASTSCAN'),
+        'counts': {'COLUMN': 'COLUMNINFO'},
+        'rows': 'LASTSCAN',
+    },
+    'GEF-Anker-data': {
+        'required': ('COLUMN', 'COLUMNINFO', 'COLUMNVOID', 'LASTSCAN'),
+        'counts': {'COLUMN': 'COLUMNINFO'},
+        'rows': 'LASTSCAN',
+    },
+    UPLOAD_RULES: {
+        'required': ('LOCATIONAME', 'LOCATIONX', 'LOCATIONY', 'LOCATIONZ', 'TESTTYPE', 'STARTDATE', 'ANCHORTYPE'),
+        'text': ('LOCATIONAME',),
+        'ranges': {'LOCATIONX': (-180, 180), 'LOCATIONY': (-90, 90), 'LOCATIONZ': (None, None)},
+        'enums': {'TESTTYPE': ('investigation', 'suitability', 'acceptance'),
+                  'ANCHORTYPE': ('self-drilling', 'stranded', 'screw injection')},
+    },
+}
+
+# Meldingen per soort regel
+RULE_MESSAGES = {
+    'required': '%s not found',
+    'text': '%s cannot be empty',
+    'number': '%s should be a number',
+    'range': '%s should be within a range of %g to %g',
+    'minimum': '%s should be at least %g',
+    'maximum': '%s should be at most %g',
+    'enum': '%s should have one of the following values: %s',
+    'count': '%s does not match the number of %s',
+    'rows': '%s does not match the length of datablok',
+    'datablok': 'datablok not found',
+}
+
+_TEXT_RE = re.compile('[a-zA-Z]')
+
+
+def range_message(keyword, minimum, maximum):
+    # Melding voor een getal buiten (minimum, maximum)
+    if minimum is None and maximum is None:
+        return RULE_MESSAGES['number'] % keyword
+    if minimum is None:
+        return RULE_MESSAGES['maximum'] % (keyword, maximum)
+    if maximum is None:
+        return RULE_MESSAGES['minimum'] % (keyword, minimum)
+    return RULE_MESSAGES['range'] % (keyword, minimum, maximum)
+
+
+def enum_message(keyword, values):
+    return RULE_MESSAGES['enum'] % (keyword, ''.join('\n - ' + value for value in values))
+
+
+def report_codes(headerdict, validate, rules=RULES):
+    # De conventies waartegen wordt gevalideerd: die uit #REPORTCODE en, als validate een REPORTCODE is, ook die
+    codes = [code for code in rules if code in headerdict.get('REPORTCODE', ())]
+    if isinstance(validate, str) and validate not in codes:
+        codes.append(validate)
+    return codes
+
+
+class RuleSet:
+    """
+    De regels van een conventie (een entry van RULES), een keer gecompileerd (compile_rules) en daarna
+    toegepast op een of veel headerdicts tegelijk: read_gef(..., validate=...), test_gef en gefrules.
+
+    Reguliere expressies en meldingen worden bij het compileren gemaakt, de getallen van ranges worden voor
+    alle bestanden in een keer met numpy vergeleken. check_header heeft alleen de header nodig (draait direct
+    na #EOH=), check_rows het aantal rijen van het data block.
+    """
+
+    def __init__(self, report_code, rules):
+        self.report_code = report_code
+        self.required = [(keyword, RULE_MESSAGES['required'] % keyword) for keyword in rules.get('required', ())]
+        self.text = [(keyword, RULE_MESSAGES['text'] % keyword) for keyword in rules.get('text', ())]
+
+        ranges = rules.get('ranges', {})
+        self.range_keywords = list(ranges)
+        self.has_minimum = np.array([bounds[0] is not None for bounds in ranges.values()], dtype=bool)
+        self.has_maximum = np.array([bounds[1] is not None for bounds in ranges.values()], dtype=bool)
+        self.minimum = np.array([bounds[0] if bounds[0] is not None else -np.inf for bounds in ranges.values()])
+        self.maximum = np.array([bounds[1] if bounds[1] is not None else np.inf for bounds in ranges.values()])
+        self.number_messages = [RULE_MESSAGES['number'] % keyword for keyword in ranges]
+        self.range_messages = [range_message(keyword, *bounds) for keyword, bounds in ranges.items()]
+
+        # de waarde moet een van de toegestane waarden bevatten, zoals de oorspronkelijke acceptatie eisen
+        self.enums = [(keyword, re.compile('|'.join(re.escape(value) for value in values)), enum_message(keyword, values))
+                      for keyword, values in rules.get('enums', {}).items()]
+        self.counts = [(keyword, multipar, RULE_MESSAGES['count'] % (keyword, multipar))
+                       for keyword, multipar in rules.get('counts', {}).items()]
+        self.rows = rules.get('rows')
+        self.rows_message = RULE_MESSAGES['rows'] % self.rows if self.rows else None
+
+    def __bool__(self):
+        # False voor een conventie zonder regels (GEF-BORE-Report)
+        return bool(self.required or self.text or self.range_keywords or self.enums or self.counts or self.rows)
+
+    # Purpose: Regels die alleen de header nodig hebben; has_data per bestand of #EOH= er is.
+    # Geeft per headerdict een lijst met Finding's.
+    def check_header(self, headerdicts, has_data):
+        findings = [[] for _ in headerdicts]
+
+        for keyword, message in self.required:
+            for i, headerdict in enumerate(headerdicts):
+                if keyword not in headerdict:
+                    findings[i].append(Finding('error', keyword, message))
+
+        for keyword, message in self.text:
+            for i, headerdict in enumerate(headerdicts):
+                if keyword in headerdict and not (isinstance(headerdict[keyword][0], str) and
+                                                  _TEXT_RE.search(headerdict[keyword][0])):
+                    findings[i].append(Finding('error', keyword, message))
+
+        if self.range_keywords and headerdicts:
+            first = [[headerdict[keyword][0] if keyword in headerdict else None for keyword in self.range_keywords]
+                     for headerdict in headerdicts]
+            present = np.array([[value is not None for value in values] for values in first], dtype=bool)
+            number = np.array([[isinstance(value, float) for value in values] for values in first], dtype=bool)
+            values = np.array([[value if isinstance(value, float) else np.nan for value in values] for values in first])
+            # NaN valt buiten iedere grens
+            with np.errstate(invalid='ignore'):
+                inside = (~self.has_minimum | (values >= self.minimum)) & (~self.has_maximum | (values <= self.maximum))
+            for i, j in zip(*np.nonzero(present & ~(number & inside))):
+                message = self.range_messages[j] if number[i, j] else self.number_messages[j]
+                findings[i].append(Finding('error', self.range_keywords[j], message))
+
+        for keyword, pattern, message in self.enums:
+            for i, headerdict in enumerate(headerdicts):
+                if keyword in headerdict and not (isinstance(headerdict[keyword][0], str) and
+                                                  pattern.search(headerdict[keyword][0])):
+                    findings[i].append(Finding('error', keyword, message))
+
+        for keyword, multipar, message in self.counts:
+            for i, headerdict in enumerate(headerdicts):
+                if keyword in headerdict and multipar in headerdict and \
+                        headerdict[keyword][0] != len(headerdict[multipar]):
+                    findings[i].append(Finding('error', keyword, message))
+
+        if self.rows:
+            for i in range(len(headerdicts)):
+                if not has_data[i]:
+                    findings[i].append(Finding('error', 'datablok', RULE_MESSAGES['datablok']))
+
+        return findings
+
+    # Purpose: Regels die het aantal rijen van het data block nodig hebben (rows per bestand, None als het
+    # data block niet is gelezen). Geeft per headerdict een lijst met Finding's.
+    def check_rows(self, headerdicts, rows):
+        findings = [[] for _ in headerdicts]
+        if self.rows:
+            for i, headerdict in enumerate(headerdicts):
+                if rows[i] is not None and self.rows in headerdict and headerdict[self.rows][0] != rows[i]:
+                    findings[i].append(Finding('error', self.rows, self.rows_message))
+        return findings
+
+    def check(self, headerdicts, has_data, rows):
+        return [header + data for header, data in
+                zip(self.check_header(headerdicts, has_data), self.check_rows(headerdicts, rows))]
+
+
+def compile_rules(rules=None):
+    """
+    Compileert de regels per REPORTCODE.
+    :param rules: {REPORTCODE: regels} in de vorm van RULES (bv uit gefrules.load_rules), zonder rules RULES
+    :return: {REPORTCODE: RuleSet}
+    """
+    if rules is None:
+        return COMPILED_RULES
+    if all(isinstance(rule_set, RuleSet) for rule_set in rules.values()):
+        return rules
+    return {report_code: RuleSet(report_code, code_rules) for report_code, code_rules in rules.items()}
+
+
+COMPILED_RULES = {report_code: RuleSet(report_code, code_rules) for report_code, code_rules in RULES.items()}
+
+
+def check_rules(headerdicts, has_data, rows, validate=True, rules=None):
+    """
+    Toetst headerdicts aan de regels van hun #REPORTCODE, iedere RuleSet draait een keer over alle bestanden
+    van zijn conventie. Met een REPORTCODE als validate gelden de regels van die conventie voor ieder bestand.
+    :param headerdicts: lijst met headerdicts (zonder of met 'datablok')
+    :param has_data: per bestand of het een data block heeft (#EOH= gevonden)
+    :param rows: per bestand het aantal rijen, None als het data block (nog) niet is gelezen
+    :param validate: True of een REPORTCODE, zie read_gef
+    :param rules: {REPORTCODE: regels of RuleSet}, zonder rules RULES
+    :return: (per bestand een lijst met Finding's, per bestand de lijst met getoetste REPORTCODEs)
+    """
+    rules = compile_rules(rules)
+    findings = [[] for _ in headerdicts]
+    codes = [report_codes(headerdict, validate, rules) for headerdict in headerdicts]
+    for i, headerdict in enumerate(headerdicts):
+        if 'REPORTCODE' not in headerdict:
+            findings[i].append(Finding('error', 'REPORTCODE', RULE_MESSAGES['required'] % 'REPORTCODE'))
+        elif not codes[i]:
+            findings[i].append(Finding('warning', 'REPORTCODE',
+                                       'REPORTCODE %s is not validated' % headerdict['REPORTCODE'][0]))
+
+    batches = {}
+    for code, rule_set in rules.items():
+        members = [i for i in range(len(headerdicts)) if code in codes[i]]
+        if members:
+            batch = rule_set.check([headerdicts[i] for i in members], [has_data[i] for i in members],
+                                   [rows[i] for i in members])
+            batches[code] = dict(zip(members, batch))
+    # de bevindingen per bestand in de volgorde van zijn conventies
+    for i in range(len(headerdicts)):
+        for code in codes[i]:
+            findings[i].extend(batches[code][i])
+
+    # een bevinding die voor meerdere conventies geldt maar een keer
+    return [list(dict.fromkeys(file_findings)) for file_findings in findings], codes
+
+
 class Gef2OpenClass:
     def __init__(self):
         dummy=[]
+        self.findings = []  # Finding's van de validatie (read_gef(..., validate=...))
+        self.stats = None  # ReadStats van de laatste read_gef(..., profile=...)
+        self.header = None  # GefHeader, gezet door read_gef
+        self.column_index = {}  # kolomnummer -> index in het data block (array mode)
+        self.data_offset = None  # byte positie van het data block, gezet door read_gef
+        self.void_mask = None  # True waar het data block een nodata waarde heeft (read_gef(..., voids=...))
+        self.tail_offset = None  # byte positie na de laatste gelezen regel (read_gef(..., tail=True))
         
     # Purpose: Of een BORE-Report file is (boring)
     def gbr_is_gbr(self):
-        if 'PROCEDURECODE' in self.headerdict:
-            if 'GEF-BORE-Report' in self.headerdict['PROCEDURECODE']:
-                out = True
-            else:
-                out = False
-        else:
-            if 'REPORTCODE' in self.headerdict:
-                if 'GEF-BORE-Report' in self.headerdict['REPORTCODE']:
-                    out = True
-                else:
-                    out = False
-            else:
-                out = False
-        try:
-            return out
-        except:
-            return None
+        return self.header.is_bore
 
     # Purpose: Of een GEF-CPT-Report file is (sondering)
     def gcr_is_gcr(self):
-        if 'PROCEDURECODE' in self.headerdict:
-            if 'GEF-CPT-Report' in self.headerdict['PROCEDURECODE']:
-                out = True
-            else:
-                out = False
-        else:
-            if 'REPORTCODE' in self.headerdict:
-                if 'GEF-CPT-Report' in self.headerdict['REPORTCODE']:
-                    out = True
-                else:
-                    out = False
-            else:
-                out = False
-        try:
-            return out
-        except:
-            return None
+        return self.header.is_cpt
 
     # Purpose: Of #COMPANYID aanwezig
     def get_companyid_flag(self):
-        if 'COMPANYID' in self.headerdict:
-            if len(self.headerdict['COMPANYID']) > 0:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self.header.companyid_flag
 
     # Purpose: Geeft aantal kolommen in het data block
     def get_column(self):
-        if 'COLUMN' in self.headerdict:
-            if len(self.headerdict['COLUMN']) > 0:
-                out = self.headerdict['COLUMN'][0]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self.header.column
 
     # Purpose: Of #COLUMN aanwezig
     def get_column_flag(self):
-        if ('COLUMN' in self.headerdict):
-            if len(self.headerdict['COLUMN']) > 0:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self.header.column_flag
 
     # Purpose: Geeft nodata waarde voor geselecteerde kolom
     def get_column_void(self, i_Kol):
@@ -166,21 +833,17 @@ class Gef2OpenClass:
 
     # Purpose: Geeft company naam
     def get_companyid_Name(self):
-        if 'COMPANYID' in self.headerdict:
-            if len(self.headerdict['COMPANYID']) > 0:
-                out = self.headerdict['COMPANYID'][0]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self.header.companyid_name
 
     # Purpose: Geeft waarde uit bepaalde cel van data block
     def get_data(self, i_Kol, iRij):
+        if 'datablok' in self.headerdict and isinstance(self.headerdict['datablok'], np.ndarray):
+            datablok = self.headerdict['datablok']
+            if 1 <= iRij <= datablok.shape[0]:
+                if 1 <= i_Kol <= datablok.shape[1]:
+                    return datablok[iRij - 1, i_Kol - 1]
+                return 'MissingKol'
+            return 'MissingRij'
         if 'datablok' in self.headerdict:
             if iRij in self.headerdict['datablok']:
                 if len(self.headerdict['datablok'][iRij]) >= i_Kol - 1:
@@ -200,6 +863,14 @@ class Gef2OpenClass:
     # TODO continue get_data_iter
     # Purpose: geeft een iterator met alle waarden voor een bepaalde kolom in een data block
     def get_data_iter(self, i_Kol):
+        if self._column_view(i_Kol) is not None:
+            void = self.get_column_void(i_Kol)
+            voids = self._column_void_mask(i_Kol)
+            for i, (depth, value) in enumerate(zip(self._column_view(1).tolist(), self._column_view(i_Kol).tolist())):
+                if value == void or (voids is not None and voids[i]):  #Replace nodata value for None
+                    value = None
+                yield (depth, value)
+            return
         try:
             if 'datablok' in self.headerdict:
                 if len(self.headerdict['datablok'][1]) >= i_Kol - 1:
@@ -219,6 +890,14 @@ class Gef2OpenClass:
 
     # Purpose: geeft een iterator met alle waarden voor een bepaalde kolom in een data block
     def get_column_iter(self, i_Kol):
+        if self._column_view(i_Kol) is not None:
+            void = self.get_column_void(i_Kol)
+            voids = self._column_void_mask(i_Kol)
+            for i, value in enumerate(self._column_view(i_Kol).tolist()):
+                if value == void or (voids is not None and voids[i]):  #Replace nodata value for None
+                    value = None
+                yield value
+            return
         try:
             if 'datablok' in self.headerdict:
                 if len(self.headerdict['datablok'][1]) >= i_Kol - 1:
@@ -236,10 +915,16 @@ class Gef2OpenClass:
             yield err
 
     def get_data_column(self, i_Kol):
-        """extract data from file"""
-        value = []
-        for a in self.get_column_iter(i_Kol):
-            value.append(a)
+        """extract data from file
+
+        In array mode (read_gef(..., as_array=True)) value is a view on the column of the
+        data block, void values are left as they are (NaN with read_gef(..., voids='nan')).
+        """
+        value = self._column_view(i_Kol)
+        if value is None:
+            value = []
+            for a in self.get_column_iter(i_Kol):
+                value.append(a)
 
         column_info = self.get_column_info(i_Kol)
         unit = column_info[1]
@@ -247,6 +932,26 @@ class Gef2OpenClass:
 
         return value, unit, name
 
+    # Purpose: Geeft een view op kolom i_Kol van het data block in array mode, anders None
+    def _column_view(self, i_Kol):
+        datablok = self.headerdict.get('datablok')
+        if not isinstance(datablok, np.ndarray):
+            return None
+        index = self.column_index.get(i_Kol)
+        if index is None or index >= datablok.shape[1]:
+            return None
+        return datablok[:, index]
+
+    # Purpose: Kolom i_Kol van self.void_mask als lijst (array mode met voids, na voids='nan' is de nodata
+    # waarde zelf NaN geworden), anders None
+    def _column_void_mask(self, i_Kol):
+        if self.void_mask is None:
+            return None
+        index = self.column_index.get(i_Kol)
+        if index is None or index >= self.void_mask.shape[1]:
+            return None
+        return self.void_mask[:, index].tolist()
+
     # Purpose: Of gegeven #MEASUREMENTTEXT index aanwezig
     def get_measurementtext_flag(self, i_Index):
         if 'MEASUREMENTTEXT' in self.headerdict:
@@ -314,277 +1019,80 @@ class Gef2OpenClass:
     # Purpose: Geeft aantal rijen in het data block
     # neem aan waarde achter 'LASTSCAN', maar check dit!
     def get_nr_scans(self):
-        if 'LASTSCAN' in self.headerdict:
-            if len(self.headerdict['LASTSCAN']) > 0:
-                out = self.headerdict['LASTSCAN'][0]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self.header.nr_scans
 
     # Purpose: Of #PARENT aanwezig
     # neeem aan dat er een par 'PARENT' aanwezig moet zijn. Check!
     def get_parent_flag(self):
-        if ('PARENT' in self.headerdict):
-            if len(self.headerdict['PARENT']) > 0:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None  # test
+        return self.header.parent_flag
 
     # Purpose: Geeft referentie naar de parent, bv bestandsnaam
     def get_parent_reference(self):
-        if 'PARENT' in self.headerdict:
-            if len(self.headerdict['PARENT']) > 0:
-                out = self.headerdict['PARENT'][0]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            return 'Error:%s' % (err)
+        return self.header.parent_reference
 
     # Purpose: Of #PROCEDURECODE aanwezig
     def get_procedurecode_flag(self):
-        if 'PROCEDURECODE' in self.headerdict:
-            if len(self.headerdict['PROCEDURECODE']) > 0:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self.header.procedurecode_flag
 
     # Purpose: Geeft procedurecode code
     def get_procedurecode_Code(self):
-        if 'PROCEDURECODE' in self.headerdict:
-            if len(self.headerdict['PROCEDURECODE']) > 0:
-                out = self.headerdict['PROCEDURECODE'][0]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self.header.procedurecode_code
 
     # Purpose: Of #PROJECTID aanwezig
     def get_projectid_flag(self):
-        if 'PROJECTID' in self.headerdict:
-            if len(self.headerdict['PROJECTID']) > 0:
-                out = True
-            else:
-                out = False
-        try:
-            return out
-        except:
-            return None
+        return self.header.projectid_flag
 
     # Purpose: Geeft projectid nummer
     def get_projectid_Number(self):
-        if 'PROJECTID' in self.headerdict:
-            if len(self.headerdict['PROJECTID']) > 1:
-                out = self.headerdict['PROJECTID'][1]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self.header.projectid_number
 
     # Purpose: Of #REPORTCODE aanwezig
     def get_reportcode_flag(self):
-        if 'REPORTCODE' in self.headerdict:
-            if len(self.headerdict['REPORTCODE']) > 0:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self.header.reportcode_flag
 
     # Purpose: Geeft reportcode code
     def get_reportcode_Code(self):
-        if 'REPORTCODE' in self.headerdict:
-            if len(self.headerdict['REPORTCODE']) > 0:
-                out = self.headerdict['REPORTCODE'][0]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self.header.reportcode_code
 
     # Purpose: Of #STARTDATE aanwezig
     def get_startdate_flag(self):
-        if 'STARTDATE' in self.headerdict:
-            if len(self.headerdict['STARTDATE']) > 2:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self.header.startdate_flag
 
     # Purpose: Geeft startdate jaar (yyyy)
     def get_startdate_Yyyy(self):
-        if 'STARTDATE' in self.headerdict:
-            if len(self.headerdict['STARTDATE']) > 2:
-                out = int(self.headerdict['STARTDATE'][0])
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self.header.startdate_yyyy
 
     # Purpose: Geeft startdate maand (mm)
     def get_startdate_Mm(self):
-        if 'STARTDATE' in self.headerdict:
-            if len(self.headerdict['STARTDATE']) > 2:
-                out = int(self.headerdict['STARTDATE'][1])
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self.header.startdate_mm
 
     # Purpose: Geeft startdate dag (dd)
     def get_startdate_Dd(self):
-        if 'STARTDATE' in self.headerdict:
-            if len(self.headerdict['STARTDATE']) > 2:
-                out = int(self.headerdict['STARTDATE'][2])
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self.header.startdate_dd
 
     # Purpose: Of #XYID aanwezig
     def get_xyid_flag(self):
-        if 'XYID' in self.headerdict:
-            if len(self.headerdict['XYID']) > 2:
-                out = True
-            else:
-                out = False
-        try:
-            return out
-        except:
-            return None
+        return self.header.xyid_flag
 
     # Purpose: Geeft X coordinaat
     def get_xyid_X(self):
-        if 'XYID' in self.headerdict:
-            if len(self.headerdict['XYID']) > 0:
-                out = self.headerdict['XYID'][1]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self.header.xyid_x
 
     # Purpose: Geeft Y coordinaat
     def get_xyid_Y(self):
-        if 'XYID' in self.headerdict:
-            if len(self.headerdict['XYID']) > 1:
-                out = self.headerdict['XYID'][2]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self.header.xyid_y
 
     # Purpose: Of #ZID aanwezig
     def get_zid_flag(self):
-        if 'ZID' in self.headerdict:
-            if len(self.headerdict['ZID']) > 0:
-                out = True
-            else:
-                out = False
-        else:
-            out = False
-        try:
-            return out
-        except:
-            return None
+        return self.header.zid_flag
 
     # Purpose: Geeft Z coordinaat
     def get_zid_Z(self):
-        if 'ZID' in self.headerdict:
-            if len(self.headerdict['ZID']) > 1:
-                out = self.headerdict['ZID'][1]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self.header.zid_z
 
     # Purpose: Geeft testid
     def get_testid(self):
-        if ('TESTID' in self.headerdict):
-            if len(self.headerdict['TESTID']) > 0:
-                out = self.headerdict['TESTID'][0]
-            else:
-                err = 'MissingValue'
-        else:
-            err = 'MissingKeyword'
-        try:
-            return out
-        except:
-            # return None
-            return 'Error:%s' % (err)
+        return self.header.testid
         
     # Purpose: Initialiseren interne geheugenstructuur
     # niet nodig
@@ -597,28 +1105,417 @@ class Gef2OpenClass:
         Geeft de corrected depth wanneer gevraagd en aanwezig bij opvragen quantity number = 1 (penetration depth)
         :param i_iQtyNumber: quantity number volgens GEF definitie
         :param get_corrected_depth: Wanneer TRUE en i_iQtyNumber = 1 word kolom voor quantity number 11 gezocht
-        :return: index van waarde in data blok
+        :return: kolomnummer (1-based, zoals i_Kol in get_data) van waarde in data blok
+        Opzoeken gaat via self.header.quantity_columns, dat een keer bij het parsen wordt gevuld.
         """
         try:
             i_iQtyNumber = int(i_iQtyNumber)
-            for key, columninfo in self.headerdict['COLUMNINFO'].iteritems():
-                if int(columninfo[3]) == i_iQtyNumber:
-                    out = key
-                if get_corrected_depth and i_iQtyNumber == 1:
-                    if int(columninfo[3]) == 11:
-                        out = key
-            return int(out)
-        except:
-            # return None
+        except (TypeError, ValueError, OverflowError):
+            return 'Error: Quantity Number niet gevonden in GEF file'
+        if get_corrected_depth and i_iQtyNumber == 1 and 11 in self.header.quantity_columns:
+            return self.header.quantity_columns[11]
+        out = self.header.quantity_columns.get(i_iQtyNumber)
+        if out is None:
             return 'Error: Quantity Number niet gevonden in GEF file'
+        return out
 
     # Purpose: Leest een gegeven Gef bestand en zet alle info in een dictionary
-    def read_gef(self, i_sBestandGef):
+    # engine='fast' gebruikt de single-pass tokenizer, engine='legacy' de oorspronkelijke regex parser.
+    # Beide engines leveren dezelfde headerdict op, zie compare_engines().
+    # Met as_array=True wordt het data block in een keer ingelezen als 2-D float64 numpy array
+    # (headerdict['datablok'], rijen 0-based) in plaats van een dict met een list per rij.
+    # Met header_only=True stopt het lezen na #EOH=, het data block kan later met read_data() worden geladen.
+    # self.data_offset bevat de byte positie waar het data block begint (None als #EOH= ontbreekt).
+    # Met lazy=True wordt het bestand memory-mapped en is headerdict['datablok'] een LazyDatablok:
+    # alleen de byte posities van de rijen worden bepaald, een rij wordt pas bij opvragen gedecodeerd.
+    # Geeft de header #COLUMNSEPARATOR en/of #RECORDSEPARATOR op (bij #DATAFORMAT= ASCII of zonder
+    # #DATAFORMAT), dan wordt het data block met die scheidingstekens gesplitst in plaats van met de
+    # legacy regels (';', spatie en tab).
+    # self.header is een GefHeader met de getypeerde header waarden, de getters lezen daaruit.
+    # Met voids='mask' of voids='nan' (alleen met as_array=True) wordt #COLUMNVOID in een keer op het hele
+    # data block toegepast: self.void_mask is dan een boolean array met de vorm van het data block, True
+    # waar een waarde gelijk is aan de nodata waarde van zijn kolom. Bij voids='nan' worden die waarden
+    # bovendien vervangen door NaN.
+    # Alleen de header wordt gedecodeerd, met encoding of, zonder encoding, met de eerste codering uit ENCODINGS
+    # waarmee de header foutloos te decoderen is (self.encoding). Het data block wordt als bytes gelezen en
+    # met as_array zonder decoderen omgezet; is het data block niet te decoderen met self.encoding, dan met de
+    # volgende codering uit ENCODINGS. Met engine='legacy' wordt het hele bestand met encoding geopend
+    # (zonder encoding met de codering van het platform).
+    # i_sBestandGef is een pad, of de inhoud van een bestand als bytes/bytearray/memoryview of als binair
+    # file-like object (bv een upload of download), dan is er geen tijdelijk bestand nodig. Een file-like
+    # object wordt niet gesloten. lazy=True en tail=True werken alleen met een pad.
+    # Met tail=True (voor bestanden die nog worden geschreven) worden alleen complete regels gelezen en
+    # onthoudt het object waar het gebleven is; refresh() leest daarna alleen de nieuw toegevoegde rijen.
+    # #LASTSCAN in de headerdict (en get_nr_scans()) volgt dan het aantal gelezen rijen.
+    # Met validate=True wordt het bestand tijdens het parsen getoetst aan de conventie van zijn #REPORTCODE
+    # (GEF-CPT-Report, GEF-BORE-Report of GEF-Anker-data, de regels uit RULES die ook test_gef gebruikt). Met
+    # een REPORTCODE als validate gelden de regels van die conventie ook als het bestand een andere #REPORTCODE
+    # heeft; met validate=UPLOAD_RULES gelden daarnaast de acceptatie eisen van de upload. Alle bevindingen
+    # komen in self.findings (lijst met Finding's). De header regels draaien direct na #EOH=; met
+    # fail_fast=True stopt read_gef dan bij een fout, zonder het data block te lezen, en geeft False terug (ook
+    # bij een fout in het data block).
+    # Met profile=True wordt per fase (io, header, multipar, data) de tijd, de toename van het aantal
+    # gealloceerde blokken en het aantal regels en waarden gemeten in self.stats (ReadStats). Is profile een
+    # functie, dan wordt die na het lezen aangeroepen met de ReadStats, ook als het lezen mislukt.
+    # Zonder profile is self.stats None en kost het meten niets.
+    def read_gef(self, i_sBestandGef, engine='fast', as_array=False, header_only=False, lazy=False, voids=None,
+                 tail=False, encoding=None, validate=False, fail_fast=False, profile=False):
+        if voids not in (None, 'mask', 'nan'):
+            raise ValueError("voids should be None, 'mask' or 'nan', not %r" % (voids,))
+        if voids is not None and not as_array:
+            raise ValueError('voids can only be used with as_array=True')
+        if isinstance(validate, str) and validate not in RULES:
+            raise ValueError('validate should be True or one of %s, not %r' % (', '.join(RULES), validate))
+        if engine == 'legacy':
+            if as_array or header_only or lazy or tail or validate or profile:
+                raise ValueError("as_array, header_only, lazy, tail, validate and profile are only supported by "
+                                 "engine='fast'")
+            return self._read_gef_legacy(i_sBestandGef, encoding)
+        if engine != 'fast':
+            raise ValueError("engine should be 'fast' or 'legacy', not %r" % (engine,))
+        if lazy and (as_array or header_only):
+            raise ValueError('lazy cannot be combined with as_array or header_only')
+        if tail and (lazy or header_only):
+            raise ValueError('tail cannot be combined with lazy or header_only')
+        if (lazy or tail) and not isinstance(i_sBestandGef, (str, os.PathLike)):
+            raise ValueError('lazy and tail need the path of a file')
+        self.stats = stats = ReadStats(_source_name(i_sBestandGef)) if profile else None
+        if stats is not None:
+            read_started = time.perf_counter()
+        try:
+            # een file-like object kan niet opnieuw worden gelezen, bytes en paden wel (read_data)
+            self.bestand = None if hasattr(i_sBestandGef, 'read') else i_sBestandGef
+            self.tail_offset = None
+            self.findings = []
+            with _open_source(i_sBestandGef) as f:
+                if stats is not None:
+                    started = stats.start(('io', 'multipar'))
+                self._parse_header(f, encoding)
+                self.header = GefHeader(self.headerdict)
+                if stats is not None:
+                    stats.stop('header', started)
+                if validate:
+                    self.findings = check_rules([self.headerdict], [self.data_offset is not None], [None], validate)[0][0]
+                    if fail_fast and self.has_errors():
+                        return False
+                if tail:
+                    self._tail_options = {'as_array': as_array, 'voids': voids, 'encoding': self.encoding}
+                    self.tail_offset = self.data_offset or 0
+                if stats is not None:
+                    started = stats.start(('io',))
+                if self.data_offset is None or header_only:
+                    pass
+                elif tail:
+                    ncols = len(self.headerdict.get('COLUMNINFO', {}))
+                    self._tail_rows = _RowBuffer(ncols) if as_array else None
+                    self._tail_mask = _RowBuffer(ncols, bool, False) if as_array and voids is not None else None
+                    self._set_datablok(self._tail_rows.rows if as_array else {})
+                    if voids is not None:
+                        self.void_mask = self._tail_mask.rows
+                    f.seek(self.data_offset)
+                    self._parse_tail(f, voids)
+                elif lazy:
+                    self._set_datablok(LazyDatablok.from_file(f, self.data_offset, self.encoding,
+                                                              _separators(self.headerdict)))
+                else:
+                    self._parse_data(f, as_array, voids)
+                if stats is not None and 'datablok' in self.headerdict:
+                    datablok = self.headerdict['datablok']
+                    stats.stop('data', started, lines=len(datablok), tokens=_count_tokens(datablok))
+            # in tail mode volgt #LASTSCAN het aantal gelezen rijen
+            if validate and not (header_only or tail) and 'datablok' in self.headerdict:
+                rows = len(self.headerdict['datablok'])
+                for code in report_codes(self.headerdict, validate):
+                    self.findings += COMPILED_RULES[code].check_rows([self.headerdict], [rows])[0]
+                self.findings = list(dict.fromkeys(self.findings))
+            return not (fail_fast and self.has_errors())
+
+        except IndexError:
+            print (
+                "%s Headerdict() in UtlGefOpen.py geef IndexError: fout bij uitlezen gef" % _source_name(
+                    i_sBestandGef))
+            return False
+
+        finally:
+            if stats is not None:
+                stats.total_seconds = time.perf_counter() - read_started
+                if callable(profile):
+                    profile(stats)
+
+    # Purpose: Of de validatie van read_gef fouten heeft gevonden (self.findings met severity 'error')
+    def has_errors(self):
+        return any(finding.severity == 'error' for finding in self.findings)
+
+    # Purpose: Laadt het data block van een bestand dat met read_gef(..., header_only=True) is gelezen.
+    # Met read_gef(..., profile=...) telt het laden mee in self.stats (fasen io en data).
+    def read_data(self, as_array=False, voids=None):
+        if voids is not None and not as_array:
+            raise ValueError('voids can only be used with as_array=True')
+        if self.data_offset is None:
+            return False
+        if self.bestand is None:
+            raise ValueError('read_data needs a path or bytes, a file object cannot be read again')
+        stats = self.stats
+        if stats is not None:
+            started = stats.start(('io',))
+        with _open_source(self.bestand) as f:
+            f.seek(self.data_offset)
+            self._parse_data(f, as_array, voids)
+        if stats is not None:
+            datablok = self.headerdict['datablok']
+            stats.stop('data', started, lines=len(datablok), tokens=_count_tokens(datablok))
+            stats.total_seconds += time.perf_counter() - started[0]
+        return True
+
+    # Purpose: Leest een Gef bestand als stroom. Geeft eerst de header (GefHeader, de headerdict staat in
+    # self.headerdict maar zonder 'datablok') en daarna het data block in blokken van chunk_rows rijen als
+    # 2-D float64 numpy array (alleen het laatste blok kan kleiner zijn). Er is steeds maar een blok in
+    # geheugen, zodat het geheugengebruik niet afhangt van de grootte van het bestand. Met voids='nan'
+    # worden de nodata waarden uit #COLUMNVOID per blok vervangen door NaN.
+    # i_sBestandGef kan, net als bij read_gef, ook bytes of een binair file-like object zijn.
+    # Voorbeeld: for chunk in islice(myGef.stream_gef(bestand), 1, None): writer.write(chunk)
+    def stream_gef(self, i_sBestandGef, chunk_rows=65536, voids=None, encoding=None):
+        if voids not in (None, 'nan'):
+            raise ValueError("voids should be None or 'nan' when streaming, not %r" % (voids,))
+        if chunk_rows < 1:
+            raise ValueError('chunk_rows should be at least 1')
+        self.bestand = None if hasattr(i_sBestandGef, 'read') else i_sBestandGef
+        self.stats = None
+        with _open_source(i_sBestandGef) as f:
+            self._parse_header(f, encoding)
+            self.header = GefHeader(self.headerdict)
+            self.column_index = self._build_column_index()
+            yield self.header
+            if self.data_offset is None:
+                return
+
+            ncols = len(self.headerdict.get('COLUMNINFO', {}))
+            separators = _encode_separators(_separators(self.headerdict))
+            batch = []
+            for line in f:
+                if line.strip(b' \t\r\n') == b'':  # lege regels uitsluiten
+                    continue
+                batch.append(line)
+                if len(batch) == chunk_rows:
+                    yield self._stream_chunk(batch, ncols, separators, voids)
+                    batch = []
+            if batch:
+                yield self._stream_chunk(batch, ncols, separators, voids)
+
+    # Purpose: Zet een lijst dataregels (bytes) om naar een blok voor stream_gef
+    def _stream_chunk(self, batch, ncols, separators, voids):
+        chunk = _parse_data_array(b''.join(batch), ncols, separators)
+        if voids == 'nan':
+            chunk[chunk == self._void_row(chunk.shape[1])] = np.nan
+        return chunk
+
+    # Purpose: Leest de header met de opgegeven codering, of probeert zonder encoding de coderingen uit
+    # ENCODINGS tot de hele header zonder fouten te decoderen is. Alleen de header wordt gedecodeerd.
+    def _parse_header(self, f, encoding=None):
+        if encoding is not None:
+            return self._parse_header_as(f, encoding)
+        start = f.tell()
+        for encoding in ENCODINGS[:-1]:
+            try:
+                return self._parse_header_as(f, encoding)
+            except UnicodeDecodeError:
+                f.seek(start)
+        return self._parse_header_as(f, ENCODINGS[-1])
+
+    # Purpose: Single-pass tokenizer voor de header, leest binair tot en met #EOH= zodat de byte
+    # positie van het data block bekend is
+    def _parse_header_as(self, f, encoding):
+        self.headerdict = headerdict = {}
+        self.column_index = {}
+        self.data_offset = None
+        self.void_mask = None
+        self.encoding = encoding
+        b = None  # net als in de legacy parser blijft b staan tussen regels
+        offset = 0
+        stats = self.stats
+        for raw in (f if stats is None else stats.timed_lines(f)):
+            # losse '\r' is in tekst modus ook een regeleinde
+            for piece in (_CR_SPLIT_RE.split(raw) if b'\r' in raw else (raw,)):
+                offset += len(piece)
+                line = piece.decode(self.encoding)
+                if line.endswith('\r\n'):
+                    line = line[:-2] + '\n'
+                elif line.endswith('\r'):
+                    line = line[:-1] + '\n'
+
+                linetmp = line.lstrip(' \t')
+                if linetmp == '' or linetmp == '\n':  # lege regels uitsluiten
+                    continue
+
+                par, eq, rest = _split_par(linetmp)
+                if linetmp[0] == '#' or '\n' in linetmp:
+                    if eq:
+                        keyinfo = rest.lstrip(' \t')
+                        b = _KEYINFO_SPLIT_RE.split(keyinfo) if keyinfo != '' else None
+                    else:
+                        b = None
+                    if par in MULTIPARS:
+                        if stats is not None:
+                            started = stats.start()
+                        if is_number(b[0]):
+                            parno = int(b[0])
+                        else:
+                            parno = b[0]
+                        c = [_to_value(i.lstrip('\t| ')) for i in b]
+                        if par not in headerdict:
+                            headerdict[par] = {parno: c}
+                        else:
+                            headerdict[par][parno] = c
+                        if stats is not None:
+                            stats.stop('multipar', started, lines=1, tokens=len(c))
+                        continue
+
+                if par == 'EOH':
+                    headerdict[par] = {}
+                    self.data_offset = offset
+                    return
+                elif par not in MULTIPARS and b is not None:
+                    headerdict[par] = [_to_value(i.lstrip('\t| ')) for i in b]
+                if stats is not None:
+                    stats.phases['header']['lines'] += 1
+                    stats.phases['header']['tokens'] += len(b) if b is not None else 0
+
+    # Purpose: Zet het data block in de headerdict, in dezelfde volgorde van keys als de legacy
+    # parser ('datablok' voor 'EOH')
+    def _set_datablok(self, datablok):
+        self.headerdict.pop('EOH', None)
+        self.headerdict['datablok'] = datablok
+        self.headerdict['EOH'] = {}
+        return datablok
+
+    # Purpose: Tokenizer voor het data block vanaf de huidige positie in het (binaire) bestand f.
+    # Het data block wordt als bytes gelezen; as_array zet de bytes zonder decoderen om naar een array.
+    def _parse_data(self, f, as_array=False, voids=None):
+        headerdict = self.headerdict
+        self._set_datablok({})
+        separators = _separators(headerdict)
+        data = f.read() if self.stats is None else self.stats.read(f)
+        if as_array:
+            ncols = len(headerdict.get('COLUMNINFO', {}))
+            headerdict['datablok'] = _parse_data_array(data, ncols, _encode_separators(separators))
+            self.column_index = self._build_column_index()
+            if voids is not None:
+                self._apply_voids(voids == 'nan')
+            return
+
+        # een keer decoderen en als tekst tokenizen, float() is op str sneller dan op bytes
+        self._add_data_lines(io.StringIO(_decode_data(data, self.encoding), newline=None), separators)
+
+    # Purpose: Tokenizet dataregels en voegt ze als rijen toe aan het data block (dict) in de headerdict
+    def _add_data_lines(self, lines, separators):
+        headerdict = self.headerdict
+        datablok = headerdict['datablok']
+        # zonder gedeclareerde scheidingstekens de tokenizer die gelijk is aan de legacy parser
+        parse_line = _parse_data_line if separators is None else _separated_line_parser(*separators)
+        tel = len(datablok)
+        for line in lines:
+            linetmp = line.lstrip(' \t')
+            if linetmp == '' or linetmp == '\n':  # lege regels uitsluiten
+                continue
+            # regels zonder '#' en '=' direct tokenizen
+            if linetmp[0] != '#' and '=' not in linetmp:
+                tel = tel + 1
+                datablok[tel] = parse_line(linetmp)
+                continue
+            par = _split_par(linetmp)[0]
+            if par == 'EOH':
+                datablok = headerdict['datablok'] = {}
+                headerdict[par] = {}
+                tel = 0
+            else:
+                tel = tel + 1
+                datablok[tel] = parse_line(par)
+
+    # Purpose: Tail mode: parset de complete regels vanaf de huidige positie in f en voegt ze toe aan het
+    # data block. Een laatste regel zonder regeleinde wordt overgeslagen omdat die nog wordt geschreven.
+    # Onthoudt de byte positie na de laatste complete regel (self.tail_offset), zet #LASTSCAN op het
+    # aantal rijen en geeft het aantal nieuwe rijen terug.
+    def _parse_tail(self, f, voids=None):
+        headerdict = self.headerdict
+        start = f.tell()
+        data = f.read() if self.stats is None else self.stats.read(f)
+        end = data.rfind(b'\n') + 1
+        cr = data.rfind(b'\r')
+        if end <= cr < len(data) - 1:  # losse '\r' (oud Mac regeleinde), een '\r' aan het einde kan nog '\r\n' worden
+            end = cr + 1
+        self.tail_offset = start + end
+        data = data[:end]
+
+        before = len(headerdict['datablok'])
+        if isinstance(headerdict['datablok'], np.ndarray):
+            rows = _parse_data_array(data, len(headerdict.get('COLUMNINFO', {})),
+                                     _encode_separators(_separators(headerdict)))
+            headerdict['datablok'] = datablok = self._tail_rows.append(rows)
+            # de kolom index is nodig voor de nodata waarden, bij de eerste aanroep is hij er nog niet
+            self.column_index = self._build_column_index()
+            if voids is not None:
+                rows = datablok[len(datablok) - len(rows):]
+                mask = rows == self._void_row(rows.shape[1])
+                if voids == 'nan':
+                    rows[mask] = np.nan
+                self.void_mask = self._tail_mask.append(mask)
+        else:
+            self._add_data_lines(io.StringIO(_decode_data(data, self.encoding), newline=None), _separators(headerdict))
+
+        count = len(headerdict['datablok'])
+        headerdict['LASTSCAN'] = [float(count)]
+        self.header = GefHeader(headerdict)
+        return count - before if count >= before else count
+
+    # Purpose: Leest de rijen die aan het bestand zijn toegevoegd sinds read_gef(..., tail=True) of de
+    # vorige refresh(), zonder het bestand opnieuw te parsen. Geeft het aantal nieuwe rijen.
+    # Is het bestand korter geworden (opnieuw begonnen) of was #EOH= er nog niet, dan wordt het
+    # bestand opnieuw gelezen.
+    def refresh(self):
+        if self.tail_offset is None:
+            raise ValueError('refresh() can only be used after read_gef(..., tail=True)')
+        if self.data_offset is None or os.path.getsize(self.bestand) < self.tail_offset:
+            self.read_gef(self.bestand, tail=True, **self._tail_options)
+            return len(self.headerdict.get('datablok', {}))
+        with open(self.bestand, 'rb') as f:
+            f.seek(self.tail_offset)
+            return self._parse_tail(f, self._tail_options.get('voids'))
+
+    # Purpose: Koppelt kolomnummers uit #COLUMNINFO aan de kolom index in het data block
+    def _build_column_index(self):
+        column_index = {}
+        for key in self.headerdict.get('COLUMNINFO', {}):
+            if isinstance(key, int) and key >= 1:
+                column_index[key] = key - 1
+        if not column_index and isinstance(self.headerdict.get('datablok'), np.ndarray):
+            column_index = {i + 1: i for i in range(self.headerdict['datablok'].shape[1])}
+        return column_index
+
+    # Purpose: Past #COLUMNVOID toe op het data block in array mode met een vergelijking per kolom
+    # in een keer (broadcast), zet self.void_mask en vervangt de nodata waarden eventueel door NaN
+    def _apply_voids(self, to_nan=False):
+        datablok = self.headerdict['datablok']
+        self.void_mask = datablok == self._void_row(datablok.shape[1])
+        if to_nan and self.void_mask.any():
+            datablok[self.void_mask] = np.nan
+
+    # Purpose: Geeft de nodata waarde uit #COLUMNVOID per kolom index van het data block (array mode)
+    def _void_row(self, ncols):
+        void_row = np.full(ncols, np.nan)  # NaN is nergens gelijk aan: kolom zonder void
+        for i_Kol, index in self.column_index.items():
+            void = self.headerdict.get('COLUMNVOID', {}).get(i_Kol, [])
+            if index < ncols and len(void) > 1 and isinstance(void[1], float):
+                void_row[index] = void[1]
+        return void_row
+
+    # Purpose: Oorspronkelijke regex parser, bewaard als referentie (engine='legacy')
+    # Zonder encoding wordt het bestand met de codering van het platform geopend.
+    def _read_gef_legacy(self, i_sBestandGef, encoding=None):
         EOH = False
         try:
-            multipars = ['COLUMNINFO', 'COLUMNVOID', 'MEASUREMENTTEXT', 'MEASUREMENTVAR', 'SPECIMENVAR', 'SPECIMENTEXT']
+            multipars = MULTIPARS
             self.headerdict = {}
-            f = open(i_sBestandGef, 'r')
+            f = open(i_sBestandGef, 'r', encoding=encoding)
             tel = 0
             for line in f.readlines():
                 line = re.sub('\r\n', '', line)  # haal alle \r\n aan het einde van de regel weg
@@ -699,6 +1596,7 @@ class Gef2OpenClass:
                                         c.append(e)
                                 self.headerdict[par] = c
 
+            self.header = GefHeader(self.headerdict)
             return True
 
         except IndexError:
@@ -707,66 +1605,41 @@ class Gef2OpenClass:
                     i_sBestandGef))
             return False
     def test_gef(self):
-        # test if COLUMN is in the headerdict
+        # standards according to:
+        # https://publicwiki.deltares.nl/display/STREAM/GEF-CPT?preview=/102204318/102334492/GEF-CPT.pdf
+        # De regels per REPORTCODE staan in RULES, dezelfde als voor read_gef(..., validate=True)
         assert 'REPORTCODE' in self.headerdict, 'REPORTCODE not found'
-
-        if 'GEF-BORE-Report' in self.headerdict['REPORTCODE']:
-            return
-        
-        elif 'GEF-CPT-Report' in self.headerdict['REPORTCODE']:
-            # standards according to:
-            # https://publicwiki.deltares.nl/display/STREAM/GEF-CPT?preview=/102204318/102334492/GEF-CPT.pdf
-            
-            # *** test presence of key labels: file tracing ***
-            assert 'GEFID' in self.headerdict, 'GEFID not found'
-            assert 'COMPANYID' in self.headerdict, 'COMPANYID not found'
-            assert 'FILEDATE' in self.headerdict, 'FILEDATE not found'
-            assert 'FILEOWNER' in self.headerdict, 'FILEOWNER not found'
-            assert 'PROJECTID' in self.headerdict, 'PROJECTID not found'
-            assert 'TESTID' in self.headerdict, 'TESTID not found'
-            assert 'ZID' in self.headerdict, 'ZID not found'
-                        
-            # *** test presence of key labels: data descriptive ***
-            # test if COLUMN is in the headerdict
-            assert 'COLUMN' in self.headerdict, 'COLUMN not found'
-
-            # test if COLUMNINFO is in the headerdict
-            assert 'COLUMNINFO' in self.headerdict, 'COLUMNINFO not found'
-
-            # test if COLUMN is in the headerdict
-            assert 'COLUMNVOID' in self.headerdict, 'COLUMNVOID not found'
-
-            # test if COLUMN is in the headerdict
-            assert 'datablok' in self.headerdict, 'datablok not found'
-
-            # *** test internal logic of the data
-            # test if there are as many COLUMNINFO's as you would expect from the field COLUMN
-            assert self.headerdict['COLUMN'][0]==len(self.headerdict['COLUMNINFO']), 'COLUMNS does not match the number of COLUMNINFO'
-
-            # test if the LASTSCAN value euqals the lenght of the data block
-            assert self.headerdict['LASTSCAN'][0]==len(self.headerdict['datablok']), 'LASTSCAN does not match the length of datablok' 
-            
-            
+        datablok = self.headerdict.get('datablok')
+        findings, codes = check_rules([self.headerdict], ['datablok' in self.headerdict],
+                                      [len(datablok) if datablok is not None else None])
+        errors = [finding.message for finding in findings[0] if finding.severity == 'error']
+        assert not errors, '\n'.join(errors)
+        # True als het bestand aan regels is getoetst (niet bij GEF-BORE-Report, dat geen regels heeft)
+        if any(COMPILED_RULES[code] for code in codes[0]):
             return True
-        elif 'GEF-Anker-data' in self.headerdict['REPORTCODE']:
-            # *** test presence of key labels ***
-            # test if COLUMN is in the headerdict
-            assert 'COLUMN' in self.headerdict, 'COLUMN not found'
-
-            # test if COLUMNINFO is in the headerdict
-            assert 'COLUMNINFO' in self.headerdict, 'COLUMNINFO not found'
-
-            # test if COLUMN is in the headerdict
-            assert 'COLUMNVOID' in self.headerdict, 'COLUMNVOID not found'
 
-            # test if COLUMN is in the headerdict
-            assert 'datablok' in self.headerdict, 'datablok not found'
-
-            # *** test internal logic of the data
-            # test if there are as many COLUMNINFO's as you would expect from the field COLUMN
-            assert self.headerdict['COLUMN'][0]==len(self.headerdict['COLUMNINFO']), 'COLUMNS does not match the number of COLUMNINFO'
-
-            # test if the LASTSCAN value euqals the lenght of the data block
-            assert self.headerdict['LASTSCAN'][0]==len(self.headerdict['datablok']), 'LASTSCAN does not match the length of datablok' 
-            
-            return True
\ No newline at end of file
+def compare_engines(file_list, encoding=None):
+    """
+    Leest ieder bestand met engine='fast' en engine='legacy' en vergelijkt de headerdicts.
+    Beide engines gebruiken dezelfde codering: encoding, of zonder encoding de codering die de fast engine
+    voor het bestand herkent (self.encoding). Een bestand dat niet te lezen is stopt de vergelijking niet.
+    :param file_list: lijst met paden naar GEF bestanden
+    :param encoding: codering van de bestanden, None om die per bestand te laten herkennen
+    :return: dictionary {bestand: lijst met keys die verschillen, of 'Error:...' als een engine het bestand niet
+             kan lezen}, alleen voor bestanden met verschillen of fouten
+    """
+    verschillen = {}
+    for bestand in file_list:
+        try:
+            fast = Gef2OpenClass()
+            fast.read_gef(bestand, engine='fast', encoding=encoding)
+            legacy = Gef2OpenClass()
+            legacy.read_gef(bestand, engine='legacy', encoding=fast.encoding)
+        except Exception as e:
+            verschillen[bestand] = 'Error:%s: %s' % (type(e).__name__, e)
+            continue
+        keys = set(legacy.headerdict) | set(fast.headerdict)
+        diff = sorted(k for k in keys if legacy.headerdict.get(k) != fast.headerdict.get(k))
+        if diff or list(legacy.headerdict) != list(fast.headerdict):
+            verschillen[bestand] = diff
+    return verschillen
@@ -0,0 +1,208 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from gefgenerate import generate_anker, generate_cpt
+from gefreader import Gef2OpenClass
+
+RAW_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Raw_data')
+SIZES = (1000, 100000, 1000000)
+
+
+def _parsed(path, **read_kwargs):
+    myGef = Gef2OpenClass()
+    myGef.read_gef(path, **read_kwargs)
+    return myGef
+
+
+def _retrieve_metadata(path):
+    # api_uploader needs the config module with the API keys, without it the benchmark is skipped
+    from api_uploader import retrieve_metadata
+    return retrieve_metadata
+
+
+# name: (setup(path) -> state, run(path, state), kinds of data sets it runs on)
+BENCHMARKS = {
+    'read_gef': (lambda path: None, lambda path, state: _parsed(path), ('sample', 'cpt', 'anker')),
+    'read_gef_array': (lambda path: None, lambda path, state: _parsed(path, as_array=True), ('sample', 'cpt', 'anker')),
+    'get_data_column': (_parsed, lambda path, state: state.get_data_column(2), ('sample', 'cpt', 'anker')),
+    'test_gef': (_parsed, lambda path, state: state.test_gef(), ('sample', 'cpt', 'anker')),
+    # retrieve_metadata needs LOCATIONX and LOCATIONY, which only the generated anchor files have
+    'retrieve_metadata': (_retrieve_metadata, lambda path, state: state(path), ('anker',)),
+}
+
+
+def make_datasets(work_dir, sizes=SIZES, raw_data=RAW_DATA):
+    '''
+    Returns {name: (kind, path, rows)} of the sample files and of generated CPT and anchor files of the given
+    sizes, generated files are written once to work_dir and reused by later runs
+    '''
+    datasets = {}
+    for path in sorted(glob.glob(os.path.join(raw_data, '*.GEF'))):
+        myGef = _parsed(path, header_only=True)
+        rows = myGef.get_nr_scans()
+        datasets['sample_' + os.path.basename(path)] = ('sample', path, int(rows) if isinstance(rows, float) else 0)
+
+    os.makedirs(work_dir, exist_ok=True)
+    for rows in sizes:
+        for kind, generate in (('cpt', generate_cpt), ('anker', generate_anker)):
+            path = os.path.join(work_dir, '%s_%d.GEF' % (kind, rows))
+            if not os.path.isfile(path):
+                generate(path, rows=rows, seed=rows)
+            datasets['%s_%d' % (kind, rows)] = (kind, path, rows)
+    return datasets
+
+
+def _measure(setup, run, path, repeat):
+    '''
+    Returns (best wall time of repeat runs in s, peak memory of one run in bytes), the setup is not measured
+    '''
+    best = None
+    for _ in range(repeat):
+        state = setup(path)
+        start = time.perf_counter()
+        run(path, state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # separate run for the memory: tracemalloc slows the code down
+    state = setup(path)
+    tracemalloc.start()
+    try:
+        run(path, state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmarks(work_dir=None, sizes=SIZES, repeat=3, benchmarks=None, raw_data=RAW_DATA, verbose=True):
+    '''
+    Times the parser functions on the sample files and on generated files of the given numbers of rows
+
+    Parameters
+    ----------
+    work_dir : str
+        Directory for the generated files, defaults to a directory in the temporary directory
+    sizes : tuple
+        Numbers of rows of the generated CPT and anchor files
+    repeat : int
+        Number of timed runs, the fastest counts
+    benchmarks : list
+        Names from BENCHMARKS to run, defaults to all
+    raw_data : str
+        Directory with the sample files
+
+    Returns
+    ---------
+    results: dict
+        'environment' and under 'results' per '<benchmark>/<data set>': seconds, rows, bytes, rows_per_s,
+        mb_per_s and peak_mb, or 'skipped' with the reason
+    '''
+    if work_dir is None:
+        work_dir = os.path.join(tempfile.gettempdir(), 'gef_benchmark')
+    datasets = make_datasets(work_dir, sizes, raw_data)
+
+    results = {}
+    for name in benchmarks or BENCHMARKS:
+        setup, run, kinds = BENCHMARKS[name]
+        for dataset, (kind, path, rows) in datasets.items():
+            if kind not in kinds:
+                continue
+            key = name + '/' + dataset
+            try:
+                seconds, peak = _measure(setup, run, path, repeat)
+            except Exception as e:
+                results[key] = {'skipped': type(e).__name__ + ': ' + str(e)}
+            else:
+                size = os.path.getsize(path)
+                results[key] = {'seconds': seconds, 'rows': rows, 'bytes': size,
+                                'rows_per_s': rows / seconds if seconds else None,
+                                'mb_per_s': size / 1024 ** 2 / seconds if seconds else None,
+                                'peak_mb': peak / 1024 ** 2}
+            if verbose:
+                print(_format_line(key, results[key]))
+
+    environment = {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+                   'processor': platform.processor(), 'date': datetime.now().isoformat(timespec='seconds')}
+    return({'environment': environment, 'results': results})
+
+
+def compare_results(results, baseline, tolerance=0.25, min_seconds=0.001):
+    '''
+    Returns the regressions of results against a baseline (both from run_benchmarks)
+
+    A benchmark regresses when its time or peak memory is more than tolerance (a fraction) above the
+    baseline. Times below min_seconds are too noisy to compare and are skipped.
+
+    Returns
+    ---------
+    regressions: list
+        Per regression a dict with benchmark, metric ('seconds' or 'peak_mb'), baseline, current and ratio
+    '''
+    regressions = []
+    for key, current in results['results'].items():
+        reference = baseline['results'].get(key)
+        if reference is None or 'skipped' in current or 'skipped' in reference:
+            continue
+        for metric in ('seconds', 'peak_mb'):
+            if metric == 'seconds' and max(current[metric], reference[metric]) < min_seconds:
+                continue
+            if reference[metric] and current[metric] > reference[metric] * (1 + tolerance):
+                regressions.append({'benchmark': key, 'metric': metric, 'baseline': reference[metric],
+                                    'current': current[metric], 'ratio': current[metric] / reference[metric]})
+    return(regressions)
+
+
+def _format_line(key, result):
+    if 'skipped' in result:
+        return '%-45s skipped (%s)' % (key, result['skipped'])
+    return '%-45s %9.4f s %12.0f rows/s %8.1f MB/s %9.1f MB peak' % (
+        key, result['seconds'], result['rows_per_s'] or 0, result['mb_per_s'] or 0, result['peak_mb'])
+
+
+def main(argv=None):
+    '''
+    Usage:
+    `python benchmark_gef.py --save baseline.json` to record a baseline
+    `python benchmark_gef.py --baseline baseline.json` to compare against it, exits with 1 on a regression
+    '''
+    parser = argparse.ArgumentParser(description='Benchmarks of the GEF parser')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='rows of the generated files')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark, the fastest counts')
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--work-dir', help='directory for the generated files')
+    parser.add_argument('--save', help='write the results as JSON, e.g. as new baseline')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slow down as fraction')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.work_dir, tuple(args.sizes), args.repeat, args.benchmarks)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as stream:
+            json.dump(results, stream, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        regressions = compare_results(results, baseline, args.tolerance)
+        for regression in regressions:
+            print('REGRESSION %(benchmark)s %(metric)s: %(baseline).4g -> %(current).4g (x%(ratio).2f)' % regression)
+        if regressions:
+            return 1
+        print('No regressions against ' + args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
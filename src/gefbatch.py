@@ -0,0 +1,107 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from gefreader import Gef2OpenClass
+
+
+def find_gef_files(source, file_format='GEF'):
+    '''
+    Returns the list of GEF files described by source
+
+    Parameters
+    -----------
+    source : str or list
+        A directory, a glob pattern (e.g. 'Raw_data/*.GEF') or a list of file paths
+    file_format : str
+        File extension used to select files when source is a directory
+
+    Returns
+    ------------
+    file_list: list
+        The paths of the selected files, sorted when taken from a directory or glob pattern
+    '''
+    if isinstance(source, (list, tuple)):
+        return list(source)
+
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, file) for file in os.listdir(source) if file.endswith(file_format))
+
+    if any(char in source for char in '*?['):
+        return sorted(glob.glob(source))
+
+    assert os.path.isfile(source), "Invalid file, directory or pattern: " + source
+    return [source]
+
+
+def _read_one(file, read_kwargs):
+    '''
+    Parses a single file inside a worker process, returns (Gef2OpenClass or None, error message or None)
+    '''
+    myGef = Gef2OpenClass()
+    try:
+        if myGef.read_gef(file, **read_kwargs):
+            return myGef, None
+        return None, 'File ' + os.path.basename(file) + ': could not be read'
+    except Exception as e:
+        return None, 'File ' + os.path.basename(file) + ': ' + type(e).__name__ + ': ' + str(e)
+
+
+def read_gef_batch(source, processes=None, chunksize=None, **read_kwargs):
+    '''
+    Parses many GEF files in a process pool
+
+    The files are submitted in chunks to limit the inter-process overhead. A file that cannot be
+    parsed does not abort the batch, its error is reported instead. Returning the data block as an
+    array (as_array=True) keeps the cost of sending the results back to the main process low.
+
+    NOTE
+    On Windows the pool starts new interpreters, so call this from under `if __name__ == "__main__":`.
+
+    Parameters
+    ----------
+    source : str or list
+        A directory, a glob pattern or a list of file paths (see find_gef_files)
+    processes : int
+        Number of worker processes, defaults to the number of CPUs. With 1 the files are read in this process
+    chunksize : int
+        Number of files per task sent to a worker, by default the files are spread in about
+        four chunks per worker
+    **read_kwargs :
+        Passed on to Gef2OpenClass.read_gef (e.g. as_array=True, header_only=True)
+
+    Returns
+    ---------
+    file_list: list
+        The files that were read
+    results: list
+        Gef2OpenClass object per file, in the order of file_list (None when the file failed)
+    errors: dict
+        Error message per failed file
+    '''
+    assert not read_kwargs.get('lazy'), 'lazy=True cannot be used in a batch: memory maps cannot be sent between processes'
+
+    file_list = find_gef_files(source)
+    read_one = partial(_read_one, read_kwargs=read_kwargs)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(file_list)))
+
+    if processes == 1:
+        parsed = list(map(read_one, file_list))
+    else:
+        if chunksize is None:
+            chunksize = max(1, len(file_list) // (processes * 4))
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            parsed = list(pool.map(read_one, file_list, chunksize=chunksize))
+
+    results = []
+    errors = {}
+    for file, (myGef, error) in zip(file_list, parsed):
+        results.append(myGef)
+        if error is not None:
+            errors[file] = error
+
+    return(file_list, results, errors)
@@ -0,0 +1,164 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from gefreader import Gef2OpenClass, GefHeader
+
+# Layout of a .gefb file:
+#   MAGIC (8 bytes) | header length (uint64, little-endian) | header (JSON, utf-8) | padding |
+#   data block as little-endian float64 in C order, starting at a multiple of ALIGNMENT |
+#   padding | void mask (one byte per value, only for an array read with voids=), at a multiple of ALIGNMENT
+MAGIC = b'GEFBIN1\n'
+ALIGNMENT = 64
+
+
+def _encode(value):
+    # dicts are stored as [key, value] pairs so integer keys (e.g. COLUMNINFO numbers) survive JSON
+    if isinstance(value, dict):
+        return {'d': [[key, _encode(item)] for key, item in value.items()]}
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        return {key: _decode(item) for key, item in value['d']}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+def _rows_as_array(datablok):
+    # A dict data block can be stored as an array when every row has the same number of floats
+    rows = list(datablok.values())
+    if list(datablok) != list(range(1, len(rows) + 1)):
+        return None
+    if any(len(row) != len(rows[0]) or not all(type(value) is float for value in row) for row in rows):
+        return None
+    return np.array(rows, dtype='<f8').reshape(len(rows), len(rows[0]) if rows else 0)
+
+
+def write_gefbin(myGef, file_path):
+    '''
+    Writes a parsed GEF file to the binary sidecar format (.gefb)
+
+    The header is stored as JSON and the numeric data block as raw float64 values, so reading it
+    back needs no text parsing and the data block can be memory-mapped. The void mask of an array
+    read with voids='mask' or voids='nan' is stored as well.
+
+    Parameters
+    ----------
+    myGef: Gef2OpenClass
+        A parsed GEF file (dict or array mode, a lazy data block is decoded first)
+    file_path: str
+        Name of the file to write
+    '''
+    headerdict = myGef.headerdict
+    datablok = headerdict.get('datablok')
+
+    data = None
+    layout = None
+    if isinstance(datablok, np.ndarray):
+        data, layout = datablok, 'array'
+    elif datablok is not None:
+        datablok = dict(datablok)  # decodes a LazyDatablok
+        data = _rows_as_array(datablok)
+        layout = 'rows' if data is not None else 'json'
+
+    void_mask = getattr(myGef, 'void_mask', None) if layout == 'array' else None
+
+    # the path of the original GEF file, to which data_offset belongs
+    bestand = getattr(myGef, 'bestand', None)
+    header = {
+        'keys': list(headerdict),
+        'headerdict': _encode({key: value for key, value in headerdict.items() if key != 'datablok'}),
+        'layout': layout,
+        'shape': list(data.shape) if data is not None else None,
+        'rows': _encode(datablok) if layout == 'json' else None,
+        'data_offset': getattr(myGef, 'data_offset', None),
+        'encoding': getattr(myGef, 'encoding', None),
+        'bestand': os.path.abspath(bestand) if isinstance(bestand, (str, os.PathLike)) else None,
+        'void_mask': void_mask is not None,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    start = len(MAGIC) + 8 + len(header_bytes)
+    padding = -start % ALIGNMENT
+
+    with open(file_path, 'wb') as stream:
+        stream.write(MAGIC)
+        stream.write(struct.pack('<Q', len(header_bytes)))
+        stream.write(header_bytes)
+        stream.write(b'\0' * padding)
+        if data is not None:
+            stream.write(np.ascontiguousarray(data, dtype='<f8').tobytes())
+        if void_mask is not None:
+            stream.write(b'\0' * (-stream.tell() % ALIGNMENT))
+            stream.write(np.ascontiguousarray(void_mask, dtype=np.bool_).tobytes())
+
+
+def read_gefbin(file_path, mmap=True):
+    '''
+    Reads a .gefb file written by write_gefbin
+
+    Parameters
+    ----------
+    file_path: str
+        Name of the .gefb file
+    mmap: bool
+        Memory-map an array data block instead of copying it into memory (read-only)
+
+    Returns
+    ---------
+    myGef: Gef2OpenClass
+        Object with the same headerdict as the one that was written
+    '''
+    with open(file_path, 'rb') as stream:
+        assert stream.read(len(MAGIC)) == MAGIC, 'File ' + file_path + ' is not a gefb file'
+        header_length, = struct.unpack('<Q', stream.read(8))
+        header = json.loads(stream.read(header_length).decode('utf-8'))
+    start = len(MAGIC) + 8 + header_length
+    start += -start % ALIGNMENT
+
+    layout = header['layout']
+    data = None
+    if layout in ('array', 'rows'):
+        shape = tuple(header['shape'])
+        if mmap and layout == 'array' and shape[0] * shape[1] > 0:
+            data = np.memmap(file_path, dtype='<f8', mode='r', offset=start, shape=shape)
+        else:
+            data = np.fromfile(file_path, dtype='<f8', offset=start, count=shape[0] * shape[1]).reshape(shape)
+
+    void_mask = None
+    if header.get('void_mask'):
+        mask_start = start + data.nbytes
+        mask_start += -mask_start % ALIGNMENT
+        void_mask = np.fromfile(file_path, dtype=np.bool_, offset=mask_start).reshape(data.shape)
+
+    if layout == 'array':
+        datablok = data
+    elif layout == 'rows':
+        datablok = {i + 1: row for i, row in enumerate(data.tolist())}
+    elif layout == 'json':
+        datablok = _decode(header['rows'])
+    else:
+        datablok = None
+
+    values = _decode(header['headerdict'])
+    values['datablok'] = datablok
+
+    myGef = Gef2OpenClass()
+    myGef.headerdict = {key: values[key] for key in header['keys']}
+    myGef.header = GefHeader(myGef.headerdict)
+    myGef.data_offset = header['data_offset']
+    myGef.encoding = header['encoding']
+    # data_offset belongs to the original GEF file, not to the .gefb file: read_data() reads from the
+    # original (when it was read from a path) and otherwise fails instead of parsing the .gefb file
+    myGef.bestand = header.get('bestand')
+    myGef.void_mask = void_mask
+    if layout == 'array':
+        myGef.column_index = myGef._build_column_index()
+
+    return(myGef)
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+
+from gefreader import Gef2OpenClass
+
+# Raise when the parser or the stored layout changes, older cache entries are then ignored and removed
+CACHE_VERSION = 4
+
+
+class GefCache:
+    '''
+    On-disk cache of parsed GEF files, placed in front of Gef2OpenClass.read_gef
+
+    An entry is keyed by the absolute path, size, modification time and a content hash of the file,
+    together with the read_gef options. It holds the parsed header and data block as a pickle, so a
+    repeated read is a single file load instead of a text parse. With as_array=True the data block
+    is stored as one binary array, which gives the smallest and fastest entries.
+
+    The cache is bounded by max_bytes: after each write the least recently used entries are removed.
+
+    Parameters
+    ----------
+    directory : str
+        Location of the cache, defaults to ~/.cache/gefreader
+    max_bytes : int
+        Maximum total size of the cache entries
+    version : str
+        Extra version label, e.g. of the processing pipeline. Entries written under another
+        version (or another CACHE_VERSION) are removed when the cache is opened
+    '''
+
+    def __init__(self, directory=None, max_bytes=512 * 1024 ** 2, version=''):
+        if directory is None:
+            directory = os.path.join(os.path.expanduser('~'), '.cache', 'gefreader')
+        self.root = directory
+        self.max_bytes = max_bytes
+        self.directory = os.path.join(directory, 'v%s-%s' % (CACHE_VERSION, version))
+        os.makedirs(self.directory, exist_ok=True)
+        self._remove_stale_versions()
+
+    def key(self, file, **read_kwargs):
+        '''
+        Returns the cache key of a file for the given read_gef options
+        '''
+        stat = os.stat(file)
+        content = hashlib.blake2b(digest_size=16)
+        with open(file, 'rb') as stream:
+            for chunk in iter(lambda: stream.read(1024 ** 2), b''):
+                content.update(chunk)
+
+        identity = repr((os.path.abspath(file), stat.st_size, stat.st_mtime_ns, content.hexdigest(),
+                         sorted(read_kwargs.items())))
+        return hashlib.blake2b(identity.encode('utf-8'), digest_size=16).hexdigest()
+
+    def read_gef(self, file, **read_kwargs):
+        '''
+        Returns a parsed Gef2OpenClass for file, from the cache when possible
+
+        Parameters
+        ----------
+        file : str
+            Path to the GEF file
+        **read_kwargs :
+            Passed on to Gef2OpenClass.read_gef (lazy=True cannot be cached)
+
+        Returns
+        ---------
+        myGef: Gef2OpenClass
+            The parsed file, or None when read_gef could not read it
+        '''
+        assert not read_kwargs.get('lazy'), 'lazy=True cannot be cached: memory maps cannot be stored'
+
+        entry = os.path.join(self.directory, self.key(file, **read_kwargs) + '.pkl')
+        myGef = Gef2OpenClass()
+        try:
+            with open(entry, 'rb') as stream:
+                myGef.__dict__.update(pickle.load(stream))
+            os.utime(entry)  # the modification time of an entry serves as its last use
+            myGef.bestand = file
+            return myGef
+        except Exception:
+            pass  # missing or unreadable entry: parse the file again
+
+        if not myGef.read_gef(file, **read_kwargs):
+            return None
+
+        # write to a temporary file first so other processes never see half an entry
+        handle, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as stream:
+            pickle.dump(myGef.__dict__, stream, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, entry)
+        self._evict()
+
+        return myGef
+
+    def invalidate(self):
+        '''
+        Removes all entries of this cache version
+        '''
+        for _, _, name in self._entries():
+            os.remove(os.path.join(self.directory, name))
+
+    def size(self):
+        '''
+        Returns the total size in bytes of the cache entries
+        '''
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+
+    def _remove_stale_versions(self):
+        current = os.path.basename(self.directory)
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name == current or not re.match(r'v[0-9]+-', name) or not os.path.isdir(path):
+                continue
+            # only remove what the cache itself wrote
+            for entry in os.listdir(path):
+                if entry.endswith(('.pkl', '.tmp')):
+                    os.remove(os.path.join(path, entry))
+            if not os.listdir(path):
+                os.rmdir(path)
@@ -0,0 +1,146 @@
+import os
+import re
+
+import numpy as np
+
+from gefbatch import find_gef_files
+from gefreader import Gef2OpenClass
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed for the Parquet export
+    pa = None
+    pq = None
+
+
+def _column_key(myGef, qn):
+    '''
+    Returns the sort key (report code prefix, quantity number) of a data table column. The quantity numbers
+    follow the GEF-CPT-Report convention; other report codes reuse the numbers for other quantities (e.g.
+    LOAD in anchor files), so their columns get the report code as prefix
+    '''
+    if myGef.header.is_cpt:
+        return ('', qn)
+    code = myGef.headerdict.get('REPORTCODE', ['unknown'])[0]
+    return (re.sub('[^a-z0-9]+', '_', str(code).lower()).strip('_') or 'unknown', qn)
+
+
+def _column_name(key):
+    return ('%s_qn%d' if key[0] else '%sqn%d') % key
+
+
+def _quantity_columns(myGef):
+    '''
+    Returns {column name: column index in the data block} from #COLUMNINFO (first column wins), e.g. qn2
+    for a CPT file and gef_anker_data_qn1 for an anchor file
+    '''
+    return {_column_key(myGef, qn): key - 1 for qn, key in myGef.header.quantity_columns.items()}
+
+
+def _header_table(file_id, file, headerdict):
+    '''
+    Returns the header of one file in long format: one record per keyword (and index for #COLUMNINFO etc.)
+    '''
+    records = {'file_id': [], 'file': [], 'keyword': [], 'index': [], 'value': []}
+    for keyword, value in headerdict.items():
+        if keyword in ('datablok', 'EOH'):
+            continue
+        items = value.items() if isinstance(value, dict) else [('', value)]
+        for index, values in items:
+            records['file_id'].append(file_id)
+            records['file'].append(os.path.basename(file))
+            records['keyword'].append(keyword)
+            records['index'].append(str(index))
+            records['value'].append(', '.join(str(v).strip() for v in values))
+    return records
+
+
+def export_collection(source, data_path, header_path):
+    '''
+    Converts many GEF files into two Parquet tables, one file at a time
+
+    The data table is in long format: one record per data row with the columns file_id, row, depth
+    and one column qn<number> per GEF quantity number found in #COLUMNINFO of the GEF-CPT-Report files
+    (e.g. qn2 for the cone resistance). depth is the corrected depth (quantity 11) when present, otherwise
+    the penetration length (quantity 1), and is only filled for GEF-CPT-Report files. Files of other report
+    codes use the quantity numbers for other quantities, their columns are named after the report code
+    (e.g. gef_anker_data_qn1 for the load of an anchor file). Nodata values (#COLUMNVOID) are stored as
+    NaN, so they do not distort the values or the statistics. Every file is written as its own row group,
+    so the min/max statistics of file_id and depth allow readers to skip files and depth ranges (predicate
+    pushdown), e.g. pandas.read_parquet(data_path, filters=[('file_id', '==', 3), ('depth', '>', 5.0)]).
+
+    The header table holds file_id, file, keyword, index and value for every header keyword.
+
+    Parameters
+    ----------
+    source : str or list
+        A directory, a glob pattern or a list of file paths (see gefbatch.find_gef_files)
+    data_path : str
+        Name of the Parquet file for the data rows
+    header_path : str
+        Name of the Parquet file for the headers
+
+    Returns
+    ---------
+    file_list: list
+        The files that were converted, file_id is the position in this list
+    errors: dict
+        Error message per file that could not be converted
+    '''
+    assert pa is not None, 'The Parquet export requires the pyarrow package'
+
+    file_list = find_gef_files(source)
+    errors = {}
+
+    # Header pass: the schema needs the quantity numbers of all files up front
+    quantities = set()
+    for file in file_list:
+        myGef = Gef2OpenClass()
+        try:
+            if myGef.read_gef(file, header_only=True):
+                quantities.update(_quantity_columns(myGef))
+        except Exception:
+            pass  # reported in the data pass
+
+    data_schema = pa.schema([('file_id', pa.int32()), ('row', pa.int32()), ('depth', pa.float64())] +
+                            [(_column_name(key), pa.float64()) for key in sorted(quantities)])
+    header_schema = pa.schema([('file_id', pa.int32()), ('file', pa.string()), ('keyword', pa.string()),
+                               ('index', pa.string()), ('value', pa.string())])
+
+    with pq.ParquetWriter(data_path, data_schema) as data_writer, \
+            pq.ParquetWriter(header_path, header_schema) as header_writer:
+        for file_id, file in enumerate(file_list):
+            myGef = Gef2OpenClass()
+            try:
+                if not myGef.read_gef(file, as_array=True, voids='nan'):
+                    errors[file] = 'File ' + os.path.basename(file) + ': could not be read'
+                    continue
+            except Exception as e:
+                errors[file] = 'File ' + os.path.basename(file) + ': ' + type(e).__name__ + ': ' + str(e)
+                continue
+
+            header_writer.write_table(pa.table(_header_table(file_id, file, myGef.headerdict),
+                                               schema=header_schema))
+
+            data = myGef.headerdict.get('datablok')
+            if data is None or data.shape[0] == 0:
+                continue
+            n_rows = data.shape[0]
+            columns = _quantity_columns(myGef)
+            missing = np.full(n_rows, np.nan)
+
+            table = {'file_id': np.full(n_rows, file_id, dtype=np.int32),
+                     'row': np.arange(1, n_rows + 1, dtype=np.int32)}
+            depth_column = None
+            if myGef.header.is_cpt and myGef.header.depth_column is not None:
+                depth_column = myGef.header.depth_column - 1
+            table['depth'] = data[:, depth_column] if depth_column is not None and depth_column < data.shape[1] \
+                else missing
+            for key in sorted(quantities):
+                index = columns.get(key)
+                table[_column_name(key)] = data[:, index] if index is not None and index < data.shape[1] \
+                    else missing
+            data_writer.write_table(pa.table(table, schema=data_schema))
+
+    return(file_list, errors)
@@ -0,0 +1,311 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+# COLUMNINFO per GEF quantity number of a CPT: (unit, name), as in 608312_DKP201.GEF
+CPT_QUANTITIES = {
+    1: ('m', 'sondeerlengte'),
+    2: ('MPa', 'Puntdruk'),
+    3: ('Mpa', 'Lokale wrijving'),
+    4: ('%', 'Wrijvingsgetal'),
+    6: ('Mpa', 'Waterdruk schouder'),
+    8: ('Graden(deg)', 'Helling'),
+    11: ('m', 'gecorrigeerde diepte'),
+}
+CPT_COLUMNS = (1, 2, 3, 6, 8, 4)
+
+# COLUMNINFO of an anchor test, as in HHTT_anker1.GEF
+ANKER_COLUMNS = (('kN', 'LOAD'), ('min', 'T'), ('mm', 'u'))
+
+# Load steps (kN) and reading times (min) of an anchor test
+ANKER_LOADS = (514, 2054, 2825, 3595, 4109, 4622, 5136)
+ANKER_TIMES = (1, 2, 3, 4, 5, 7, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60)
+
+VOID = -9999.0
+
+
+def _rng(seed):
+    return np.random.default_rng(seed)
+
+
+def cpt_data(rows, columns=CPT_COLUMNS, seed=None):
+    '''
+    Returns a synthetic cone penetration test as array with one column per GEF quantity number in columns
+
+    The cone resistance follows a layered soil profile (a smoothed random walk), the friction follows
+    from a friction ratio per layer and the pore pressure from hydrostatic pressure plus noise.
+    '''
+    if rows == 0:
+        return np.empty((0, len(columns)))
+    rng = _rng(seed)
+    depth = np.arange(rows) * 0.01
+    layers = np.cumsum(rng.normal(0, 0.05, rows))
+    # np.convolve(mode='same') returns the length of the longer input, the kernel cannot be longer than the data
+    width = min(25, rows)
+    kernel = np.ones(width) / width
+    qc = np.clip(np.exp(np.convolve(layers, kernel, mode='same')) * rng.uniform(0.5, 5) + rng.normal(0, 0.05, rows),
+                 0.01, 60)
+    ratio = np.clip(np.convolve(rng.normal(2, 1.5, rows), kernel, mode='same'), 0.2, 8)
+    fs = qc * ratio / 100
+    u2 = 0.01 * depth + rng.normal(0, 0.005, rows)
+    inclination = np.abs(np.cumsum(rng.normal(0, 0.002, rows)))
+    values = {1: depth, 2: qc, 3: fs, 4: ratio, 6: u2, 8: inclination, 11: depth * np.cos(np.radians(inclination))}
+    return np.column_stack([values[quantity] for quantity in columns])
+
+
+def anker_data(rows, seed=None):
+    '''
+    Returns a synthetic anchor test as array with the columns LOAD (kN), T (min) and u (mm)
+
+    Every load step is held for a series of readings; the displacement is elastic with creep that grows
+    with the logarithm of the time. Load cycles repeat until rows readings are made.
+    '''
+    rng = _rng(seed)
+    steps = rng.integers(3, len(ANKER_TIMES) + 1, len(ANKER_LOADS))
+    load = np.repeat(ANKER_LOADS, steps)
+    time = np.concatenate([ANKER_TIMES[:n] for n in steps])
+    load, time = np.resize(load, rows), np.resize(time, rows)
+    stiffness = rng.uniform(80, 120)
+    creep = rng.uniform(0.05, 0.3)
+    u = load / stiffness + creep * np.log(time) * load / 1000 + rng.normal(0, 0.02, rows)
+    return np.column_stack((load.astype(np.float64), time.astype(np.float64), np.round(u, 2)))
+
+
+def _add_voids(data, void_ratio, rng, skip_first=True):
+    # nodata values at random places, not in the first column (the depth or load)
+    if void_ratio <= 0 or data.size == 0:
+        return data
+    data = data.copy()
+    start = 1 if skip_first and data.shape[1] > 1 else 0
+    mask = rng.random((data.shape[0], data.shape[1] - start)) < void_ratio
+    data[:, start:][mask] = VOID
+    return data
+
+
+def cpt_header(rows, columns=CPT_COLUMNS, test_id='DKP001', variant='full', separators=None):
+    '''
+    Returns the header lines of a synthetic CPT, with the keywords of 608312_DKP201.GEF
+
+    variant 'full' writes all keywords of the example file, 'minimal' only those that test_gef requires.
+    separators is None or (column separator, record separator), e.g. (';', '!').
+    '''
+    lines = ['#GEFID= 1, 1, 0',
+             '#FILEOWNER= Wiertsema & Partners b.v.',
+             '#FILEDATE= 2014, 12, 2',
+             '#PROJECTID= CPT, 60831, 2',
+             '#COLUMN= %d' % len(columns)]
+    lines += ['#COLUMNINFO= %d, %s, %s, %d' % (i + 1, CPT_QUANTITIES[quantity][0], CPT_QUANTITIES[quantity][1], quantity)
+              for i, quantity in enumerate(columns)]
+    lines += ['#COLUMNVOID= %d, %f' % (i + 1, VOID) for i in range(len(columns))]
+    lines += ['#COMPANYID= Wiertsema, Tolbert, 31']
+    if separators is not None:
+        lines += ['#COLUMNSEPARATOR= %s' % separators[0], '#RECORDSEPARATOR= %s' % separators[1]]
+    lines += ['#DATAFORMAT= ASCII',
+              '#LASTSCAN= %d' % rows,
+              '#XYID= 31000, 101116.09, 469730.52, 1.00, 1.00',
+              '#ZID= 31000, -1.98, 0.05']
+    if variant == 'full':
+        lines += ['#MEASUREMENTTEXT= 2, Dijkonderzoek Leendert de Boerpolder fase 2, projectnaam',
+                  '#MEASUREMENTTEXT= 3, De Kaag, name of location',
+                  '#MEASUREMENTTEXT= 4, SUBP-10/001181, conus type',
+                  '#MEASUREMENTTEXT= 6, Norm : NEN-EN-ISO 22476-1; Klasse : 1, De norm waaraan deze sondering moet voldoen.',
+                  '#MEASUREMENTTEXT= 9, Ground Level, fixed horizontal level',
+                  '#MEASUREMENTVAR= 6, 1.000000, -, de wrijvings-meter is aanwezig',
+                  '#MEASUREMENTVAR= 8, 1.000000, -, de waterdruk-meter u2 is aanwezig',
+                  '#MEASUREMENTVAR= 10, 1.000000, -, de helling-meter is aanwezig',
+                  '#MEASUREMENTVAR= 16, %f, m, end depth of penetrationtest' % (max(rows - 1, 0) * 0.01),
+                  '#MEASUREMENTVAR= 20, 0.000000, MPa, offset conus voor de meting',
+                  '#MEASUREMENTVAR= 30, 0.000000, °, offset helling voor de meting']
+    elif variant != 'minimal':
+        raise ValueError("variant should be 'full' or 'minimal', not %r" % (variant,))
+    lines += ['#REPORTCODE= GEF-CPT-Report, 1, 1, 0',
+              '#PROCEDURECODE= GEF-CPT-Report, 1, 1, 0, -',
+              '#TESTID= %s' % test_id,
+              '#STARTDATE= 2014, 11, 20',
+              '#STARTTIME= 10, 25, 0.000000']
+    if variant == 'full':
+        lines += ['#OS= DOS']
+    return lines + ['#EOH=']
+
+
+def anker_header(rows, test_id='proefanker 1', variant='full', separators=None, valid=True):
+    '''
+    Returns the header lines of a synthetic anchor test, with the keywords of HHTT_anker1.GEF
+
+    With valid=True the location keywords are filled in so the file passes the upload acceptance
+    rules, otherwise they are '-' as in the example file.
+    '''
+    lines = ['#GEFID= 1, 1, 1-beta',
+             '#REPORTCODE= GEF-Anker-data, 1, 1, 0',
+             '#PROCEDURECODE= GEF-Anker-data, 1, 1, 1-beta, -',
+             '#PROJECT= HES Hartel Tank Terminal',
+             '#CLIENT= -',
+             '#COMPANYID= High 5 solutions',
+             '#STARTDATE= 2018, 6, 11']
+    if variant == 'full':
+        lines += ['#STARTTIME= -',
+                  '#DATEOFREGISTRATION= -']
+    elif variant != 'minimal':
+        raise ValueError("variant should be 'full' or 'minimal', not %r" % (variant,))
+    lines += ['#ANCHORID= %s' % test_id,
+              '#ANCHORTYPE= self-drilling']
+    if variant == 'full':
+        lines += ['#PRODUCTNAME= H5S standaard kop',
+                  '#ANCHORLENGTH= 40, m',
+                  '#GROUTLENGTH= 12.4, m',
+                  '#REALISEDGROUTDIAMETER= 0.335, m',
+                  '#ANCHORANGLE= 90, deg',
+                  '#QCCALCULATION= 17.5, MPa']
+    if valid:
+        lines += ['#LOCATIONAME= Hartel Tank Terminal',
+                  '#LOCATIONX= 4.28',
+                  '#LOCATIONY= 51.89',
+                  '#LOCATIONZ= -2.5']
+    else:
+        lines += ['#LOCATIONX= -',
+                  '#LOCATIONY= -',
+                  '#LOCATIONZ= -']
+    lines += ['#TESTTYPE= investigation']
+    if variant == 'full':
+        lines += ['#POSTSTRESSFORCE= -, kN']
+    lines += ['#COLUMN= %d' % len(ANKER_COLUMNS)]
+    lines += ['#COLUMNINFO= %d, %s, %s, %d' % (i + 1, unit, name, i + 1) for i, (unit, name) in enumerate(ANKER_COLUMNS)]
+    lines += ['#COLUMNVOID= %d, %f' % (i + 1, VOID) for i in range(len(ANKER_COLUMNS))]
+    if separators is not None:
+        lines += ['#COLUMNSEPARATOR= %s' % separators[0], '#RECORDSEPARATOR= %s' % separators[1]]
+    lines += ['#LASTSCAN=%d' % rows]
+    return lines + ['#EOH=']
+
+
+def write_gef(file_path, header, data, fmt='%.4e', encoding='cp1252', newline='\n', separators=None,
+              chunk_rows=100000):
+    '''
+    Writes header lines and a data array as GEF file
+
+    The data block is written in chunks of chunk_rows rows so files with millions of rows need little
+    extra memory. With separators (column separator, record separator) the values are separated by the
+    column separator and every row ends with the record separator, otherwise by spaces as in the examples.
+    '''
+    if separators is None:
+        delimiter, row_end = ' ', ' ' + newline
+    else:
+        delimiter, row_end = separators[0], separators[0] + separators[1] + newline
+    with open(file_path, 'wb') as stream:
+        stream.write((newline.join(header) + newline).encode(encoding))
+        for start in range(0, data.shape[0], chunk_rows):
+            np.savetxt(stream, data[start:start + chunk_rows], fmt=fmt, delimiter=delimiter, newline=row_end)
+
+
+def generate_cpt(file_path, rows=1000, columns=CPT_COLUMNS, void_ratio=0.0, encoding='cp1252', variant='full',
+                 separators=None, newline='\n', test_id=None, seed=None):
+    '''
+    Writes a synthetic CPT as GEF file
+
+    Parameters
+    ----------
+    file_path : str
+        Name of the file to write
+    rows : int
+        Number of data rows (millions are fine)
+    columns : tuple
+        GEF quantity numbers of the columns, keys of CPT_QUANTITIES
+    void_ratio : float
+        Fraction of the values (outside the first column) that are nodata (-9999)
+    encoding : str
+        Encoding of the header, e.g. 'cp1252' (as the examples), 'latin-1', 'utf-8' or 'utf-8-sig'
+    variant : str
+        'full' for all keywords of the example, 'minimal' for only the required keywords
+    separators : tuple
+        None for space separated data, or (column separator, record separator), e.g. (';', '!')
+    newline : str
+        Line ending, '\\n' or '\\r\\n'
+    test_id : str
+        #TESTID, defaults to the file name without extension
+    seed : int
+        Seed of the random generator, the same seed gives the same file
+    '''
+    if test_id is None:
+        test_id = os.path.splitext(os.path.basename(file_path))[0]
+    data = _add_voids(cpt_data(rows, columns, seed), void_ratio, _rng(seed))
+    write_gef(file_path, cpt_header(rows, columns, test_id, variant, separators), data, fmt='%.4e',
+              encoding=encoding, newline=newline, separators=separators)
+
+
+def generate_anker(file_path, rows=103, void_ratio=0.0, encoding='cp1252', variant='full', separators=None,
+                   newline='\n', test_id=None, valid=True, seed=None):
+    '''
+    Writes a synthetic anchor test as GEF file, see generate_cpt for the parameters
+
+    valid : bool
+        Fill in the location keywords so the file passes the upload acceptance rules
+    '''
+    if test_id is None:
+        test_id = os.path.splitext(os.path.basename(file_path))[0]
+    data = _add_voids(anker_data(rows, seed), void_ratio, _rng(seed))
+    write_gef(file_path, anker_header(rows, test_id, variant, separators, valid), data, fmt='%.6g',
+              encoding=encoding, newline=newline, separators=separators)
+
+
+def _generate_one(task, kind, rows, void_ratio, encodings, variants, seed):
+    '''
+    Writes file number i of a corpus inside a worker process, the options follow from the seed and i
+    '''
+    i, file_path = task
+    rng = _rng([seed, i])
+    file_kind = kind if kind != 'mixed' else ('cpt', 'anker')[rng.integers(2)]
+    options = {'rows': int(rng.integers(rows[0], rows[1] + 1)),
+               'void_ratio': void_ratio,
+               'encoding': encodings[rng.integers(len(encodings))],
+               'variant': variants[rng.integers(len(variants))],
+               'seed': [seed, i]}
+    if file_kind == 'cpt':
+        generate_cpt(file_path, **options)
+    else:
+        generate_anker(file_path, **options)
+    return file_path
+
+
+def generate_corpus(directory, n_files, kind='mixed', rows=(500, 2000), void_ratio=0.001,
+                    encodings=('cp1252', 'utf-8', 'latin-1'), variants=('full', 'minimal'), seed=0, processes=None):
+    '''
+    Writes a corpus of synthetic GEF files, e.g. 10,000 files for load tests of a batch pipeline
+
+    Parameters
+    ----------
+    directory : str
+        Directory for the files (created when missing), they are named gen_00000.GEF etc.
+    n_files : int
+        Number of files
+    kind : str
+        'cpt', 'anker' or 'mixed' (each file is a CPT or an anchor test at random)
+    rows : tuple
+        Smallest and largest number of rows per file
+    void_ratio : float
+        Fraction of nodata values
+    encodings, variants : tuple
+        Each file gets one of these encodings and header variants at random
+    seed : int
+        The same seed gives the same corpus
+    processes : int
+        Number of worker processes, defaults to the number of CPUs
+
+    Returns
+    ---------
+    file_list: list
+        The files that were written
+    '''
+    assert kind in ('cpt', 'anker', 'mixed'), "kind should be 'cpt', 'anker' or 'mixed'"
+    os.makedirs(directory, exist_ok=True)
+    tasks = [(i, os.path.join(directory, 'gen_%05d.GEF' % i)) for i in range(n_files)]
+    generate_one = partial(_generate_one, kind=kind, rows=rows, void_ratio=void_ratio, encodings=encodings,
+                           variants=variants, seed=seed)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, n_files))
+    if processes == 1:
+        return(list(map(generate_one, tasks)))
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return(list(pool.map(generate_one, tasks, chunksize=max(1, n_files // (processes * 4)))))
@@ -0,0 +1,204 @@
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from gefbatch import find_gef_files
+from gefreader import Gef2OpenClass
+
+# GEF quantity number of the cone resistance (MPa)
+CONE_RESISTANCE = 2
+
+
+def _void_data(myGef):
+    '''
+    Returns the data block of a parsed file as float array with NaN for the nodata values of #COLUMNVOID
+    '''
+    data = np.array(myGef.headerdict['datablok'], dtype=np.float64)
+    voids = np.full(data.shape[1], np.nan)
+    n = min(data.shape[1], len(myGef.header.column_voids))
+    voids[:n] = myGef.header.column_voids[:n]
+    data[data == voids] = np.nan
+    return data
+
+
+def _column(myGef, data, column):
+    '''
+    Returns the values of a 1-based GEF column number, or None when the file does not have the column
+    '''
+    if column is None:
+        return None
+    index = myGef.column_index.get(column, column - 1)
+    if index >= data.shape[1]:
+        return None
+    return data[:, index]
+
+
+def _group_median(values, groups, n_groups):
+    '''
+    Returns the median of the finite values per group (NaN for a group without values), for all groups at once
+    '''
+    keep = np.isfinite(values)
+    values, groups = values[keep], groups[keep]
+    order = np.lexsort((values, groups))
+    values = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    median = np.full(n_groups, np.nan)
+    has = counts > 0
+    low = starts[has] + (counts[has] - 1) // 2
+    high = starts[has] + counts[has] // 2
+    median[has] = (values[low] + values[high]) / 2
+    return median
+
+
+def _ratio(count, total):
+    '''
+    count / total per file, NaN where total is 0 (the check does not apply)
+    '''
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total > 0, count / np.maximum(total, 1), np.nan)
+
+
+def quality_table(source, qc_range=(0.0, 100.0), spike_window=5, spike_factor=5.0, spike_min=1.0):
+    '''
+    Computes data quality checks of many GEF files in vectorized form and scores every file
+
+    The depth and cone resistance columns of all files are concatenated with a file index, so each check
+    is a few NumPy operations over the whole collection and the results per file follow from np.bincount.
+
+    Checks per file (depth and cone resistance only for GEF-CPT-Report files):
+      - depth_decreasing: number of steps where the depth (corrected depth, quantity 11, or penetration
+        length, quantity 1) decreases, depth_monotonic is True when there are none
+      - void_fraction: fraction of the values in the data block that are nodata (#COLUMNVOID or missing),
+        max_column_void_fraction the highest fraction of a single column
+      - qc_spikes: values of the cone resistance (quantity 2) that deviate from the median of the
+        spike_window values around them by more than spike_factor times the median absolute deviation
+        of the file and by more than spike_min MPa
+      - qc_out_of_range: fraction of the cone resistance values outside qc_range (MPa)
+      - lastscan_match: #LASTSCAN equals the number of rows
+
+    score is 100 * (1 - mean of the fractions of non monotonic depth steps, void values, spikes and
+    out of range values and of a LASTSCAN mismatch (0 or 1)), ignoring checks that do not apply to a
+    file (e.g. no cone resistance in an anchor file).
+
+    Parameters
+    ----------
+    source : str or list
+        A directory, a glob pattern or a list of file paths (see gefbatch.find_gef_files), or a list of
+        Gef2OpenClass objects read with as_array=True (e.g. from gefbatch.read_gef_batch)
+    qc_range : tuple
+        Lowest and highest plausible cone resistance in MPa
+    spike_window : int
+        Number of values (odd) of the moving median used for the spike detection
+    spike_factor : float
+        Deviation from the moving median, in median absolute deviations, from which a value is a spike
+    spike_min : float
+        Smallest deviation in MPa that counts as a spike
+
+    Returns
+    ---------
+    table: dict
+        {column name: numpy array} with one entry per file (pandas.DataFrame(table) gives a data frame)
+    errors: dict
+        Error message per file that could not be checked
+    '''
+    assert spike_window >= 3 and spike_window % 2 == 1, 'spike_window should be an odd number of at least 3'
+
+    if isinstance(source, (list, tuple)) and source and all(isinstance(item, Gef2OpenClass) for item in source):
+        items = [(myGef.bestand if isinstance(myGef.bestand, str) else str(i), myGef) for i, myGef in enumerate(source)]
+    else:
+        items = []
+        for file in find_gef_files(source):
+            myGef = Gef2OpenClass()
+            try:
+                items.append((file, myGef if myGef.read_gef(file, as_array=True, voids='nan') else None))
+            except Exception as e:
+                items.append((file, type(e).__name__ + ': ' + str(e)))
+
+    # one pass over the files to collect their columns, the checks below run over the whole collection
+    files, rows, lastscan, voids, cells, max_column_void = [], [], [], [], [], []
+    depth, qc = [], []
+    errors = {}
+    for file, myGef in items:
+        if not isinstance(myGef, Gef2OpenClass) or not isinstance(myGef.headerdict.get('datablok'), np.ndarray):
+            errors[file] = 'File ' + os.path.basename(file) + ': ' + (
+                myGef if isinstance(myGef, str) else 'could not be read as array (read_gef(..., as_array=True))')
+            continue
+        data = _void_data(myGef)
+        missing = np.isnan(data)
+        files.append(file)
+        rows.append(data.shape[0])
+        nr_scans = myGef.header.nr_scans
+        lastscan.append(nr_scans if isinstance(nr_scans, float) else np.nan)
+        voids.append(missing.sum())
+        cells.append(data.size)
+        max_column_void.append(missing.mean(axis=0).max() if data.size else np.nan)
+        # the quantity numbers of depth and cone resistance are those of the GEF-CPT-Report convention
+        empty = np.empty(0)
+        column = qc_column = None
+        if myGef.header.is_cpt:
+            column = _column(myGef, data, myGef.header.depth_column)
+            qc_column = _column(myGef, data, myGef.header.quantity_columns.get(CONE_RESISTANCE))
+        depth.append(column if column is not None else empty)
+        qc.append(qc_column if qc_column is not None else empty)
+
+    n_files = len(files)
+    rows = np.array(rows, dtype=np.int64)
+    lastscan = np.array(lastscan, dtype=np.float64)
+    voids = np.array(voids, dtype=np.int64)
+    cells = np.array(cells, dtype=np.int64)
+
+    # depth: decreasing steps within a file
+    depth_file = np.repeat(np.arange(n_files), [len(column) for column in depth])
+    depth = np.concatenate(depth) if depth else np.empty(0)
+    same_file = depth_file[1:] == depth_file[:-1]
+    steps = same_file & np.isfinite(depth[1:]) & np.isfinite(depth[:-1])
+    with np.errstate(invalid='ignore'):
+        decreasing = steps & (depth[1:] < depth[:-1])
+    depth_decreasing = np.bincount(depth_file[1:][decreasing], minlength=n_files)
+    depth_steps = np.bincount(depth_file[1:][steps], minlength=n_files)
+
+    # cone resistance: range and spikes against a moving median that stays within one file
+    qc_file = np.repeat(np.arange(n_files), [len(column) for column in qc])
+    qc = np.concatenate(qc) if qc else np.empty(0)
+    valid = np.isfinite(qc)
+    with np.errstate(invalid='ignore'):
+        out_of_range = valid & ((qc < qc_range[0]) | (qc > qc_range[1]))
+    qc_values = np.bincount(qc_file[valid], minlength=n_files)
+    qc_out = np.bincount(qc_file[out_of_range], minlength=n_files)
+
+    half = spike_window // 2
+    residual = np.full(len(qc), np.nan)
+    if len(qc) >= spike_window:
+        local = np.median(sliding_window_view(qc, spike_window), axis=1)  # NaN when the window has a void
+        inside = qc_file[:-2 * half] == qc_file[2 * half:]
+        centre = np.arange(half, len(qc) - half)[inside]
+        residual[centre] = np.abs(qc[centre] - local[inside])
+    mad = _group_median(residual, qc_file, n_files) * 1.4826
+    with np.errstate(invalid='ignore'):
+        spikes = (residual > spike_factor * mad[qc_file]) & (residual > spike_min)
+    qc_spikes = np.bincount(qc_file[spikes], minlength=n_files)
+    qc_checked = np.bincount(qc_file[np.isfinite(residual)], minlength=n_files)
+
+    lastscan_match = lastscan == rows
+
+    fractions = np.vstack((_ratio(depth_decreasing, depth_steps), _ratio(voids, cells), _ratio(qc_spikes, qc_checked),
+                           _ratio(qc_out, qc_values), np.where(lastscan_match, 0.0, 1.0)))
+    applies = np.isfinite(fractions)
+    penalty = _ratio(np.where(applies, fractions, 0.0).sum(axis=0), applies.sum(axis=0))
+
+    table = {
+        'file': np.array(files, dtype=object),
+        'rows': rows,
+        'lastscan': lastscan,
+        'lastscan_match': lastscan_match,
+        'depth_decreasing': depth_decreasing,
+        'depth_monotonic': np.where(depth_steps > 0, depth_decreasing == 0, None),
+        'void_fraction': _ratio(voids, cells),
+        'max_column_void_fraction': np.array(max_column_void, dtype=np.float64),
+        'qc_spikes': qc_spikes,
+        'qc_out_of_range': _ratio(qc_out, qc_values),
+        'score': 100 * (1 - penalty),
+    }
+    return(table, errors)
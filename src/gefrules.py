@@ -0,0 +1,120 @@
+import json
+import os
+
+from gefbatch import find_gef_files
+from gefreader import Finding, Gef2OpenClass, check_rules, compile_rules
+
+# The rules (gefreader.RULES) are compiled to a gefreader.RuleSet per REPORTCODE by gefreader.compile_rules,
+# the same rule sets run in read_gef(..., validate=...) and test_gef.
+
+
+def load_rules(file_path):
+    '''
+    Reads a rule set from a JSON file with the layout of gefreader.RULES, e.g.
+    {"GEF-Anker-data": {"required": ["LOCATIONX"], "ranges": {"LOCATIONX": [-180, 180]},
+                        "enums": {"TESTTYPE": ["investigation", "acceptance"]}}}
+    An open bound of a range is written as null.
+    '''
+    with open(file_path, 'r', encoding='utf-8') as stream:
+        return(json.load(stream))
+
+
+def _read_for_check(file):
+    '''
+    Reads one file for validate_batch, returns (headerdict, has data block, number of rows, error message or None)
+    '''
+    myGef = Gef2OpenClass()
+    try:
+        # lazy: the rows are counted without converting them
+        if not myGef.read_gef(file, lazy=True):
+            return {}, False, None, 'could not be read'
+    except Exception as e:
+        return {}, False, None, type(e).__name__ + ': ' + str(e)
+    headerdict = myGef.headerdict
+    datablok = headerdict.pop('datablok', None)
+    rows = len(datablok) if datablok is not None else None
+    if datablok is not None and hasattr(datablok, 'close'):
+        datablok.close()
+    return headerdict, myGef.data_offset is not None, rows, None
+
+
+def validate_batch(source, rules=None, report_code=None):
+    '''
+    Checks many GEF files against declarative rules and returns one report for the batch
+
+    Every file is checked against the rules of its REPORTCODE. The rules are compiled once and every
+    check runs over all files of the batch, numeric ranges in one vectorized comparison.
+
+    Parameters
+    ----------
+    source : str or list
+        A directory, a glob pattern or a list of file paths (see gefbatch.find_gef_files), or a list of
+        parsed Gef2OpenClass objects (e.g. from gefbatch.read_gef_batch)
+    rules : dict
+        {REPORTCODE: rules} in the layout of gefreader.RULES or as returned by compile_rules,
+        defaults to gefreader.RULES
+    report_code : str
+        When given, the rules of this REPORTCODE apply to every file as well (e.g. gefreader.UPLOAD_RULES for uploads)
+
+    Returns
+    ---------
+    report: dict
+        'passed' (True when no file has an error), 'summary' and per file under 'files': the file, its
+        report codes, 'passed' and the findings (severity, keyword, message). See write_report
+    '''
+    rules = compile_rules(rules)
+
+    if isinstance(source, (list, tuple)) and source and all(isinstance(item, Gef2OpenClass) for item in source):
+        names = [myGef.bestand if isinstance(myGef.bestand, str) else '' for myGef in source]
+        records = []
+        for myGef in source:
+            datablok = myGef.headerdict.get('datablok')
+            records.append(({key: value for key, value in myGef.headerdict.items() if key != 'datablok'},
+                            myGef.data_offset is not None, len(datablok) if datablok is not None else None, None))
+    else:
+        names = find_gef_files(source)
+        records = [_read_for_check(file) for file in names]
+
+    # each rule set runs once over all files of its convention that could be read
+    readable = [i for i, record in enumerate(records) if record[3] is None]
+    checked, checked_codes = check_rules([records[i][0] for i in readable], [records[i][1] for i in readable],
+                                         [records[i][2] for i in readable], report_code or True, rules)
+    findings = [[Finding('error', 'file', record[3])] if record[3] is not None else [] for record in records]
+    codes = [[] for _ in records]
+    for i, file_findings, file_codes in zip(readable, checked, checked_codes):
+        findings[i] = file_findings
+        codes[i] = file_codes
+
+    files = []
+    counts = {}
+    for name, file_codes, file_findings in zip(names, codes, findings):
+        passed = not any(finding.severity == 'error' for finding in file_findings)
+        for finding in file_findings:
+            if finding.severity == 'error':
+                counts[finding.keyword] = counts.get(finding.keyword, 0) + 1
+        files.append({'file': name, 'name': os.path.basename(name), 'report_codes': file_codes, 'passed': passed,
+                      'findings': [finding._asdict() for finding in file_findings]})
+
+    n_passed = sum(item['passed'] for item in files)
+    report = {
+        'passed': n_passed == len(files),
+        'summary': {'files': len(files), 'passed': n_passed, 'failed': len(files) - n_passed,
+                    'errors_per_keyword': counts},
+        'files': files,
+    }
+    return(report)
+
+
+def write_report(report, file_path):
+    '''
+    Writes a report of validate_batch as JSON
+    '''
+    with open(file_path, 'w', encoding='utf-8') as stream:
+        json.dump(report, stream, indent=2)
+
+
+def passed_files(report):
+    '''
+    Returns the files of a report of validate_batch without errors, e.g. to gate an upload
+    '''
+    return([item['file'] for item in report['files'] if item['passed']])
@@ -52,17 +52,18 @@ def main( netID ):
         
         file_list = get_file_path(collection_chosen)
 
-        retrieved_meta = []
-        article_meta = []
-       
         authors_list = request_authors(file_list)
-        for i, file in enumerate(file_list):
-            print('\n Preparing file ', i+1 , 'out of ', len(file_list),'\n')
-            test_gef_anchor(file)
-            #art_authors = request_authors(file)
-            retrieved_meta.append(retrieve_metadata(file))
-            article_meta.append(compile_metadata(collection_chosen, retrieved_meta[i], authors_list[i], env_choice))
-            article_url = create_article(api_url, article_meta[i], api_token)
+
+        # Pre-flight: all files are tested and their metadata compiled before anything is sent
+        print('\n Preparing ', len(file_list), 'files\n')
+        manifest, errors = preflight_upload(file_list, collection_chosen, authors_list, env_choice)
+        if errors:
+            sys.exit('\n'.join(errors.values()))
+
+        for i, item in enumerate(manifest):
+            print('\n Uploading file ', i+1 , 'out of ', len(manifest),'\n')
+            file = item['file']
+            article_url = create_article(api_url, item['metadata'], api_token)
             #article_doi = reserve_doi(article_url, api_token)
             upload_dataset(article_url, api_token, file)
             #publish_article(article_url, api_token)
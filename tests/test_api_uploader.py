@@ -0,0 +1,43 @@
+import os
+import re
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import gefgenerate  # noqa: E402
+
+# api_uploader imports the API keys from the config module, which is not in the repository
+api_uploader = pytest.importorskip('api_uploader')
+
+
+def test_retrieve_metadata_keeps_header_text(tmp_path):
+    path = tmp_path / 'anker.GEF'
+    gefgenerate.generate_anker(str(path), rows=20, seed=3, newline='\r\n')
+    content = path.read_bytes()
+    for keyword, value in ((b'STARTDATE', b'2018, 06, 01'), (b'LOCATIONY', b'51.900'), (b'LOCATIONZ', b'-3.50')):
+        content = re.sub(b'#' + keyword + b'=[^\r\n]*', b'#' + keyword + b'= ' + value, content)
+    path.write_bytes(content)
+    metadata = api_uploader.retrieve_metadata(str(path))
+    assert metadata['date'] == '2018-06-01'
+    assert 'LOCATIONY=51.900' in metadata['keywords']
+    assert 'LOCATIONZ=-3.50' in metadata['keywords']
+    assert metadata['geo_lon'] == '51.9'
+    assert metadata['description'] == content.decode('cp1252').replace('\r\n', '\n').split('#EOH=', 1)[0]
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_preflight_upload_reports_every_file(tmp_path, processes):
+    files = []
+    for name, valid in (('ok1', True), ('rejected', False), ('ok2', True)):
+        files.append(str(tmp_path / (name + '.GEF')))
+        gefgenerate.generate_anker(files[-1], rows=20, valid=valid, seed=len(files))
+    manifest, errors = api_uploader.preflight_upload(files, 'grout', [[], [], []], 'sandbox', processes=processes)
+    assert [entry['file'] for entry in manifest] == [files[0], files[2]]
+    assert manifest[0]['metadata'] == api_uploader.compile_metadata(
+        'grout', api_uploader.retrieve_metadata(files[0]), [], 'sandbox')
+    # the rejected file fails the upload acceptance rules, all failed checks in one message
+    assert list(errors) == [files[1]]
+    assert 'LOCATIONAME not found' in errors[files[1]] and 'LOCATIONX should be a number' in errors[files[1]]
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import gefgenerate  # noqa: E402
+from gefbinary import read_gefbin, write_gefbin  # noqa: E402
+from gefreader import Gef2OpenClass  # noqa: E402
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+@pytest.mark.parametrize('voids', [None, 'mask', 'nan'])
+def test_array_round_trip(tmp_path, voids, mmap):
+    path = str(tmp_path / 'cpt.GEF')
+    gefgenerate.generate_cpt(path, rows=100, void_ratio=0.05, seed=1)
+    myGef = Gef2OpenClass()
+    myGef.read_gef(path, as_array=True, voids=voids)
+    write_gefbin(myGef, str(tmp_path / 'cpt.gefb'))
+    copy = read_gefbin(str(tmp_path / 'cpt.gefb'), mmap=mmap)
+    assert list(copy.headerdict) == list(myGef.headerdict)
+    assert copy.headerdict['COLUMNINFO'] == myGef.headerdict['COLUMNINFO']
+    assert np.array_equal(copy.headerdict['datablok'], myGef.headerdict['datablok'], equal_nan=True)
+    if voids is None:
+        assert copy.void_mask is None
+    else:
+        assert np.array_equal(copy.void_mask, myGef.void_mask)
+    # the path of the original file, data_offset belongs to it
+    assert copy.bestand == os.path.abspath(path)
+    assert copy.data_offset == myGef.data_offset
+
+
+def test_dict_round_trip(tmp_path):
+    path = os.path.join(ROOT, 'Raw_data', 'HHTT_anker1.GEF')
+    myGef = Gef2OpenClass()
+    myGef.read_gef(path)
+    write_gefbin(myGef, str(tmp_path / 'anker.gefb'))
+    copy = read_gefbin(str(tmp_path / 'anker.gefb'))
+    assert copy.headerdict == myGef.headerdict
+    assert copy.get_column_void(2) == myGef.get_column_void(2)
+
+
+def test_data_can_be_read_from_the_original_file(tmp_path):
+    path = str(tmp_path / 'cpt.GEF')
+    gefgenerate.generate_cpt(path, rows=30, seed=1)
+    myGef = Gef2OpenClass()
+    myGef.read_gef(path, header_only=True)
+    write_gefbin(myGef, str(tmp_path / 'cpt.gefb'))
+    copy = read_gefbin(str(tmp_path / 'cpt.gefb'))
+    assert copy.read_data(as_array=True)
+    assert copy.headerdict['datablok'].shape == (30, len(gefgenerate.CPT_COLUMNS))
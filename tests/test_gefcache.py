@@ -0,0 +1,72 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import gefgenerate  # noqa: E402
+from gefcache import GefCache  # noqa: E402
+
+
+def _entries(cache):
+    return sorted(name for name in os.listdir(cache.directory) if name.endswith('.pkl'))
+
+
+def test_second_read_comes_from_the_cache(tmp_path):
+    path = str(tmp_path / 'cpt.GEF')
+    gefgenerate.generate_cpt(path, rows=200, void_ratio=0.01, seed=1)
+    cache = GefCache(str(tmp_path / 'cache'))
+    first = cache.read_gef(path, as_array=True, voids='nan')
+    assert len(_entries(cache)) == 1
+    second = cache.read_gef(path, as_array=True, voids='nan')
+    assert len(_entries(cache)) == 1
+    assert second.bestand == path
+    assert np.array_equal(second.headerdict['datablok'], first.headerdict['datablok'], equal_nan=True)
+    assert np.array_equal(second.void_mask, first.void_mask)
+    assert second.header.nr_scans == first.header.nr_scans
+
+
+def test_options_and_changed_files_get_their_own_entry(tmp_path):
+    path = str(tmp_path / 'cpt.GEF')
+    gefgenerate.generate_cpt(path, rows=50, seed=1)
+    cache = GefCache(str(tmp_path / 'cache'))
+    dict_mode = cache.read_gef(path)
+    cache.read_gef(path, as_array=True)
+    assert len(_entries(cache)) == 2
+    gefgenerate.generate_cpt(path, rows=60, seed=2)
+    changed = cache.read_gef(path)
+    assert len(_entries(cache)) == 3
+    assert len(changed.headerdict['datablok']) == 60 != len(dict_mode.headerdict['datablok'])
+
+
+def test_lazy_cannot_be_cached(tmp_path):
+    path = str(tmp_path / 'cpt.GEF')
+    gefgenerate.generate_cpt(path, rows=10, seed=1)
+    with pytest.raises(AssertionError):
+        GefCache(str(tmp_path / 'cache')).read_gef(path, lazy=True)
+
+
+def test_cache_stays_within_max_bytes(tmp_path):
+    cache = GefCache(str(tmp_path / 'cache'), max_bytes=1)
+    for i in range(3):
+        path = str(tmp_path / ('cpt%d.GEF' % i))
+        gefgenerate.generate_cpt(path, rows=20, seed=i)
+        assert cache.read_gef(path) is not None
+    assert cache.size() == 0
+    cache.max_bytes = 10 ** 9
+    cache.read_gef(path)
+    assert cache.size() > 0
+    cache.invalidate()
+    assert cache.size() == 0
+
+
+def test_other_versions_are_removed(tmp_path):
+    path = str(tmp_path / 'cpt.GEF')
+    gefgenerate.generate_cpt(path, rows=10, seed=1)
+    old = GefCache(str(tmp_path / 'cache'), version='a')
+    old.read_gef(path)
+    GefCache(str(tmp_path / 'cache'), version='b')
+    assert not os.path.exists(old.directory)
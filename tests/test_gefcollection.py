@@ -0,0 +1,63 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import gefgenerate  # noqa: E402
+from gefcollection import export_collection  # noqa: E402
+from gefreader import Gef2OpenClass  # noqa: E402
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+@pytest.fixture
+def collection(tmp_path):
+    files = [str(tmp_path / 'cpt0.GEF'), str(tmp_path / 'cpt1.GEF'), str(tmp_path / 'anker.GEF')]
+    gefgenerate.generate_cpt(files[0], rows=300, void_ratio=0.05, seed=1)
+    gefgenerate.generate_cpt(files[1], rows=200, columns=(1, 2, 11), seed=2)
+    gefgenerate.generate_anker(files[2], rows=50, seed=3)
+    data_path, header_path = str(tmp_path / 'data.parquet'), str(tmp_path / 'header.parquet')
+    file_list, errors = export_collection(files, data_path, header_path)
+    assert file_list == files and errors == {}
+    return files, data_path, header_path
+
+
+def test_data_table_per_report_code(collection):
+    files, data_path, _ = collection
+    table = pq.read_table(data_path).to_pandas()
+    assert len(table) == 300 + 200 + 50
+    assert {'depth', 'qn1', 'qn2', 'qn11', 'gef_anker_data_qn1'} <= set(table.columns)
+
+    cpt = Gef2OpenClass()
+    cpt.read_gef(files[0], as_array=True, voids='nan')
+    rows = table[table.file_id == 0]
+    assert np.array_equal(rows.qn2.to_numpy(), cpt.get_data_column(cpt.qn2column(2))[0], equal_nan=True)
+    assert rows.qn2.isna().any()  # nodata is NaN, not -9999
+    assert not (table.drop(columns=['file_id', 'row']) == gefgenerate.VOID).any().any()
+    # depth is the corrected depth when the file has one
+    assert np.array_equal(table[table.file_id == 1].depth, table[table.file_id == 1].qn11)
+    # the anchor file has no depth, its columns are not CPT quantities
+    anker = table[table.file_id == 2]
+    assert anker.depth.isna().all() and anker.qn1.isna().all() and anker.gef_anker_data_qn1.notna().all()
+
+
+def test_one_row_group_per_file_for_predicate_pushdown(collection):
+    _, data_path, _ = collection
+    parquet = pq.ParquetFile(data_path)
+    assert parquet.metadata.num_row_groups == 3
+    statistics = parquet.metadata.row_group(1).column(0).statistics
+    assert statistics.min == statistics.max == 1
+    rows = pq.read_table(data_path, filters=[('file_id', '==', 0), ('depth', '>', 2.0)]).to_pandas()
+    assert len(rows) and (rows.file_id == 0).all() and (rows.depth > 2.0).all()
+
+
+def test_header_table(collection):
+    _, _, header_path = collection
+    header = pq.read_table(header_path).to_pandas()
+    assert set(header.file_id) == {0, 1, 2}
+    lastscan = header[(header.keyword == 'LASTSCAN')].sort_values('file_id')
+    assert list(lastscan.value) == ['300.0', '200.0', '50.0']
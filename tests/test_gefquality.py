@@ -0,0 +1,49 @@
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import gefgenerate  # noqa: E402
+from gefquality import quality_table  # noqa: E402
+
+
+def _write_cpt(path, data, rows=None):
+    header = gefgenerate.cpt_header(len(data) if rows is None else rows)
+    gefgenerate.write_gef(str(path), header, data)
+    return str(path)
+
+
+def test_quality_checks_per_file(tmp_path):
+    clean = gefgenerate.cpt_data(400, seed=1)
+    spiky = clean.copy()
+    spiky[200, 1] = 55.0  # cone resistance (quantity 2) spike
+    spiky[300, 0] = 0.5  # depth steps back
+    files = [_write_cpt(tmp_path / 'clean.GEF', clean), _write_cpt(tmp_path / 'spiky.GEF', spiky),
+             _write_cpt(tmp_path / 'lastscan.GEF', clean, rows=401)]
+    voids = str(tmp_path / 'voids.GEF')
+    gefgenerate.generate_cpt(voids, rows=400, void_ratio=0.1, seed=2)
+    anker = str(tmp_path / 'anker.GEF')
+    gefgenerate.generate_anker(anker, seed=3)
+
+    table, errors = quality_table(files + [voids, anker])
+    assert errors == {}
+    assert list(table['file']) == files + [voids, anker]
+    assert list(table['depth_monotonic'][:4]) == [True, False, True, True]
+    assert table['depth_decreasing'][1] == 1
+    assert table['qc_spikes'][0] == 0 and table['qc_spikes'][1] >= 1
+    assert list(table['lastscan_match']) == [True, True, False, True, True]
+    assert table['void_fraction'][0] == 0
+    # generate_cpt leaves the first column without voids
+    assert abs(table['void_fraction'][3] - 0.1 * 5 / 6) < 0.02
+    assert table['score'][0] == 100 and (table['score'][1:4] < 100).all()
+    # depth and cone resistance do not apply to an anchor file
+    assert table['depth_monotonic'][4] is None and np.isnan(table['qc_out_of_range'][4])
+
+
+def test_unreadable_files_are_reported(tmp_path):
+    missing = str(tmp_path / 'missing.GEF')
+    table, errors = quality_table([missing])
+    assert list(errors) == [missing] and len(table['file']) == 0
@@ -0,0 +1,233 @@
+import glob
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import gefgenerate  # noqa: E402
+from gefreader import UPLOAD_RULES, Gef2OpenClass, compare_engines  # noqa: E402
+
+RAW_DATA = sorted(glob.glob(os.path.join(ROOT, 'Raw_data', '*')))
+
+
+def test_raw_data_present():
+    assert RAW_DATA
+
+
+@pytest.mark.parametrize('file', RAW_DATA, ids=os.path.basename)
+def test_engines_identical_headerdict(file):
+    assert compare_engines([file]) == {}
+
+
+@pytest.mark.parametrize('file', RAW_DATA, ids=os.path.basename)
+def test_engines_identical_with_encoding(file):
+    # the sample files are cp1252, both engines then decode them the same way
+    assert compare_engines([file], encoding='cp1252') == {}
+
+
+def test_compare_engines_reports_errors_per_file(tmp_path):
+    missing = str(tmp_path / 'missing.GEF')
+    result = compare_engines([missing] + RAW_DATA[:1])
+    assert list(result) == [missing]
+    assert result[missing].startswith('Error:')
+
+
+def test_legacy_engine_uses_encoding():
+    myGef = Gef2OpenClass()
+    myGef.read_gef(RAW_DATA[0], engine='legacy', encoding='latin-1')
+    assert 'datablok' in myGef.headerdict
+
+
+def test_lazy_index_skips_blank_lines(tmp_path):
+    # leading spaces, blank lines of spaces and tabs and all three kinds of line endings
+    path = tmp_path / 'blank.GEF'
+    path.write_bytes(b'#GEFID= 1, 1, 0\n#COLUMN= 2\n#EOH=\n   1 2\n \t \r\n\t3 4\r\n\r  5 6\r \n#a\r\n  ')
+    lazy = Gef2OpenClass()
+    lazy.read_gef(str(path), lazy=True)
+    full = Gef2OpenClass()
+    full.read_gef(str(path))
+    assert dict(lazy.headerdict['datablok']) == full.headerdict['datablok']
+    assert len(lazy.headerdict['datablok']) == 4
+
+
+@pytest.mark.parametrize('voids', [None, 'mask', 'nan'])
+def test_tail_refresh_matches_full_read(tmp_path, voids):
+    path = tmp_path / 'tail.GEF'
+    header = b'#GEFID= 1, 1, 0\n#COLUMN= 2\n#COLUMNINFO= 1, m, a, 1\n#COLUMNINFO= 2, m, b, 2\n' \
+             b'#COLUMNVOID= 1, -9999\n#COLUMNVOID= 2, -9999\n#EOH=\n'
+    path.write_bytes(header + b'1 2\n-9999 3\n4 ')
+    tail = Gef2OpenClass()
+    tail.read_gef(str(path), as_array=True, tail=True, voids=voids)
+    for chunk in (b'5\n', b'6 -9999\n7 8\n', b'', b'9 10\n' * 3000):
+        with open(path, 'ab') as stream:
+            stream.write(chunk)
+        tail.refresh()
+        full = Gef2OpenClass()
+        full.read_gef(str(path), as_array=True, voids=voids)
+        assert np.array_equal(tail.headerdict['datablok'], full.headerdict['datablok'], equal_nan=True)
+        if voids is not None:
+            assert np.array_equal(tail.void_mask, full.void_mask)
+
+
+@pytest.mark.parametrize('file', [file for file in RAW_DATA if file.endswith('.GEF')], ids=os.path.basename)
+def test_convention_rules_are_not_upload_rules(file):
+    # the sample files follow the convention of their REPORTCODE but lack the location the upload needs
+    myGef = Gef2OpenClass()
+    myGef.read_gef(file, validate=True)
+    assert not myGef.has_errors()
+    assert myGef.test_gef()
+    upload = Gef2OpenClass()
+    upload.read_gef(file, validate=UPLOAD_RULES)
+    assert 'LOCATIONAME' in [finding.keyword for finding in upload.findings if finding.severity == 'error']
+
+
+@pytest.mark.parametrize('validate', [True, 'GEF-CPT-Report', 'GEF-Anker-data', UPLOAD_RULES])
+def test_validate_batch_matches_read_gef(validate):
+    from gefrules import validate_batch
+    report = validate_batch(RAW_DATA, report_code=None if validate is True else validate)
+    for record in report['files']:
+        myGef = Gef2OpenClass()
+        myGef.read_gef(record['file'], validate=validate)
+        assert [finding._asdict() for finding in myGef.findings] == record['findings']
+
+
+@pytest.mark.parametrize('encoding', ['utf-8-sig', 'cp1252'])
+def test_separators_with_any_header_encoding(tmp_path, encoding):
+    # an ASCII header is detected as utf-8-sig, the separators must not get its BOM
+    path = str(tmp_path / 'separators.GEF')
+    gefgenerate.generate_cpt(path, rows=50, separators=(';', '!'), variant='minimal', encoding=encoding, seed=1)
+    full = Gef2OpenClass()
+    full.read_gef(path)
+    expected = np.array(list(full.headerdict['datablok'].values()))
+    array = Gef2OpenClass()
+    array.read_gef(path, as_array=True)
+    assert np.array_equal(array.headerdict['datablok'], expected)
+    chunks = list(Gef2OpenClass().stream_gef(path, chunk_rows=7))
+    assert np.array_equal(np.vstack(chunks[1:]), expected)
+    lazy = Gef2OpenClass()
+    lazy.read_gef(path, lazy=True)
+    assert np.array_equal(lazy.headerdict['datablok'].to_array(), expected)
+    tail = Gef2OpenClass()
+    tail.read_gef(path, as_array=True, tail=True)
+    assert np.array_equal(tail.headerdict['datablok'], expected)
+
+
+def test_data_block_falls_back_to_next_encoding(tmp_path):
+    # ASCII header, cp1252 byte in a text column of the data block
+    content = b"#REPORTCODE= GEF-BORE-Report, 1, 0, 0\r\n#EOH=\r\n0.00;1.20;'Zand \xb0';!\r\n"
+    path = tmp_path / 'bore.GEF'
+    path.write_bytes(content)
+    expected = {1: [0.0, 1.2, 'Zand', '\xb0']}
+    for source, options in ((content, {}), (str(path), {}), (str(path), {'lazy': True}), (str(path), {'tail': True})):
+        myGef = Gef2OpenClass()
+        myGef.read_gef(source, **options)
+        assert dict(myGef.headerdict['datablok']) == expected
+
+
+@pytest.mark.parametrize('file', RAW_DATA, ids=os.path.basename)
+def test_depth_columns_only_for_cpt(file):
+    myGef = Gef2OpenClass()
+    myGef.read_gef(file)
+    header = myGef.header
+    if header.is_cpt:
+        assert header.depth_column == header.quantity_columns.get(11, header.quantity_columns.get(1))
+    else:
+        assert header.depth_column is None and header.penetration_length_column is None
+        # qn2column looks up quantity numbers in every convention
+        assert myGef.qn2column(1) == header.quantity_columns.get(1, myGef.qn2column(1))
+
+
+@pytest.mark.parametrize('voids', [None, 'mask', 'nan'])
+@pytest.mark.parametrize('file', [file for file in RAW_DATA if file.endswith('.GEF')], ids=os.path.basename)
+def test_iterators_replace_voids_in_array_mode(file, voids):
+    full = Gef2OpenClass()
+    full.read_gef(file)
+    array = Gef2OpenClass()
+    array.read_gef(file, as_array=True, voids=voids)
+    for i_Kol in full.headerdict['COLUMNINFO']:
+        assert list(array.get_column_iter(i_Kol)) == list(full.get_column_iter(i_Kol))
+        assert [value for _, value in array.get_data_iter(i_Kol)] == [value for _, value in full.get_data_iter(i_Kol)]
+
+
+@pytest.mark.parametrize('separators', [(';', '!'), (',', '!'), ('\t', ';')])
+def test_declared_separators_give_the_same_data(tmp_path, separators):
+    plain, separated = str(tmp_path / 'plain.GEF'), str(tmp_path / 'separated.GEF')
+    gefgenerate.generate_cpt(plain, rows=80, void_ratio=0.05, seed=4)
+    gefgenerate.generate_cpt(separated, rows=80, void_ratio=0.05, seed=4, separators=separators)
+    for options in ({}, {'lazy': True}):
+        expected, myGef = Gef2OpenClass(), Gef2OpenClass()
+        expected.read_gef(plain, **options)
+        myGef.read_gef(separated, **options)
+        assert dict(myGef.headerdict['datablok']) == dict(expected.headerdict['datablok'])
+    expected, myGef = Gef2OpenClass(), Gef2OpenClass()
+    expected.read_gef(plain, as_array=True, voids='nan')
+    myGef.read_gef(separated, as_array=True, voids='nan')
+    assert np.array_equal(myGef.headerdict['datablok'], expected.headerdict['datablok'], equal_nan=True)
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 7, 1000])
+def test_stream_gef_chunks(tmp_path, chunk_rows):
+    path = str(tmp_path / 'cpt.GEF')
+    gefgenerate.generate_cpt(path, rows=100, void_ratio=0.05, seed=5, newline='\r\n')
+    full = Gef2OpenClass()
+    full.read_gef(path, as_array=True, voids='nan')
+    myGef = Gef2OpenClass()
+    stream = myGef.stream_gef(path, chunk_rows=chunk_rows, voids='nan')
+    header = next(stream)
+    assert header.nr_scans == 100.0 and 'datablok' not in myGef.headerdict
+    chunks = list(stream)
+    assert all(len(chunk) == chunk_rows for chunk in chunks[:-1]) and 0 < len(chunks[-1]) <= chunk_rows
+    assert np.array_equal(np.vstack(chunks), full.headerdict['datablok'], equal_nan=True)
+
+
+def test_bytes_and_file_objects(tmp_path):
+    path = os.path.join(ROOT, 'Raw_data', '608312_DKP201.GEF')
+    with open(path, 'rb') as stream:
+        content = stream.read()
+    expected = Gef2OpenClass()
+    expected.read_gef(path)
+    for source in (content, bytearray(content), memoryview(content), io.BytesIO(content)):
+        myGef = Gef2OpenClass()
+        assert myGef.read_gef(source)
+        assert myGef.headerdict == expected.headerdict
+    # bytes can be read again, a file object cannot
+    myGef = Gef2OpenClass()
+    myGef.read_gef(content, header_only=True)
+    assert myGef.read_data() and myGef.headerdict == expected.headerdict
+    stream = io.BytesIO(content)
+    myGef = Gef2OpenClass()
+    myGef.read_gef(stream, header_only=True)
+    assert not stream.closed
+    with pytest.raises(ValueError):
+        myGef.read_data()
+    with pytest.raises(ValueError):
+        Gef2OpenClass().read_gef(content, lazy=True)
+
+
+@pytest.mark.parametrize('encoding, detected', [('utf-8-sig', 'utf-8-sig'), ('utf-8', 'utf-8-sig'),
+                                                ('cp1252', 'cp1252'), ('latin-1', 'cp1252')])
+def test_header_encoding_is_detected(tmp_path, encoding, detected):
+    path = tmp_path / 'encoding.GEF'
+    header = '#GEFID= 1, 1, 0\n#PROJECTNAME= Sondering \xe9\xe8n \xb0\n#COLUMN= 1\n#EOH=\n1.0\n'
+    path.write_bytes(header.encode(encoding))
+    myGef = Gef2OpenClass()
+    myGef.read_gef(str(path))
+    assert myGef.encoding == detected
+    # text values keep their line ending, as in the legacy parser
+    assert myGef.headerdict['PROJECTNAME'] == ['Sondering \xe9\xe8n \xb0\n']
+    # an explicit encoding is used as given
+    myGef.read_gef(str(path), encoding='latin-1')
+    assert myGef.encoding == 'latin-1'
+
+
+def test_header_with_bytes_of_no_encoding_falls_back_to_latin_1(tmp_path):
+    path = tmp_path / 'latin.GEF'
+    path.write_bytes(b'#GEFID= 1, 1, 0\n#PROJECTNAME= \x81\x8d\n#EOH=\n')
+    myGef = Gef2OpenClass()
+    myGef.read_gef(str(path))
+    assert myGef.encoding == 'latin-1' and myGef.headerdict['PROJECTNAME'] == ['\x81\x8d\n']